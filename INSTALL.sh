@@ -4,6 +4,9 @@
 apt-get update
 apt-get install software-properties-common git -y
 
+# the C library of the yajl2 backend
+apt-get install libyajl2 -y
+
 # add python repos
 add-apt-repository ppa:fkrull/deadsnakes -y
 apt-get update
@@ -1,5 +1,21 @@
-import aiojson.backends.python as backend
+from .backends import get_backend, default_backend
+from .utils.mappedstream import from_file, from_mmap
 
+backend = default_backend()
+
+Parser = backend.Parser
 basic_parse = backend.basic_parse
 parse = backend.parse
 items = backend.items
+items_multi = backend.items_multi
+basic_parse_batches = backend.basic_parse_batches
+parse_batches = backend.parse_batches
+documents = backend.documents
+jsonl = backend.jsonl
+parallel_jsonl = backend.parallel_jsonl
+basic_parse_bytes = backend.basic_parse_bytes
+parse_bytes = backend.parse_bytes
+items_bytes = backend.items_bytes
+basic_parse_bytes_async = backend.basic_parse_bytes_async
+parse_bytes_async = backend.parse_bytes_async
+items_bytes_async = backend.items_bytes_async
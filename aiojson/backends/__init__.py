@@ -0,0 +1,56 @@
+'''
+Parsing backends.  Every backend module provides the same interface over
+asyncio streams (basic_parse, basic_parse_batches, parse, parse_batches and
+items), producing identical events.
+'''
+import importlib
+import os
+from ctypes import util, cdll
+
+# in order of preference: yajl2 tokenizes in C, the pure-python backend
+# always works.
+BACKENDS = ('yajl2', 'python')
+
+
+class YAJLImportError(ImportError):
+    pass
+
+
+def find_yajl(required):
+    '''
+    Loads the YAJL shared library, checking it has the required major version.
+    '''
+    so_name = util.find_library('yajl')
+    if so_name is None:
+        raise YAJLImportError('YAJL shared object not found.')
+    yajl = cdll.LoadLibrary(so_name)
+    major, rest = divmod(yajl.yajl_version(), 10000)
+    minor, micro = divmod(rest, 100)
+    if major != required:
+        raise YAJLImportError('YAJL version %s.x required, found %s.%s.%s' % (required, major, minor, micro))
+    return yajl
+
+
+def get_backend(name):
+    '''
+    Returns the backend module with the given name.  Raises ImportError if it
+    can't be used here, for example when YAJL is not installed.
+    '''
+    if name not in BACKENDS:
+        raise ImportError('Unknown aiojson backend %r' % name)
+    return importlib.import_module('aiojson.backends.' + name)
+
+
+def default_backend():
+    '''
+    Returns the backend named by the AIOJSON_BACKEND environment variable,
+    or else the first one of BACKENDS available here.
+    '''
+    name = os.environ.get('AIOJSON_BACKEND')
+    if name:
+        return get_backend(name)
+    for name in BACKENDS:
+        try:
+            return get_backend(name)
+        except ImportError:
+            pass
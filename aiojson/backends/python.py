@@ -3,10 +3,13 @@
 Pure-python parsing backend.
 '''
 import decimal
+import functools
 import re
+import time
+from json.decoder import scanstring
 
 from .. import common
-from ..utils.aiogen import aiogen
+from ..utils.mappedstream import MappedStreamReader
 
 BUFSIZE = 16 * 1024
 
@@ -20,17 +23,61 @@ class UnexpectedSymbol(common.JSONError):
 
 class Buffer(object):
     LEXEME_RE = re.compile(r'[a-z0-9eE\.\+-]+|\S')
+    # all get_tokens has to look at while skipping a value: whole strings,
+    # a lone quote opening a string that doesn't end in the buffer, brackets
+    SKIP_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|["\[\]{}]', re.S)
+    # the characters get_tokens looks for, as found by indexing the buffer
+    QUOTE = '"'
+    BACKSLASH = '\\'
+    OPENERS = '[{'
 
     def __init__(self, buf):
         self.buf = buf
         self.pos = 0
         self.discarded = 0
+        self.open_string = None
+        # depth of the containers get_tokens is skipping over
+        self.skip = 0
 
     def search(self):
         return self.LEXEME_RE.search(self.buf, self.pos)
 
-    def index(self, query, start):
-        return self.buf.index(query, start)
+    def skip_search(self):
+        return self.SKIP_RE.search(self.buf, self.pos)
+
+    def find_quote(self, start):
+        return self.buf.find('"', start)
+
+    def is_escaped(self, end, start, escaped=False):
+        '''
+        Whether the character at end follows an odd run of backslashes,
+        looking back no further than start.  If the run reaches start,
+        escaped tells whether the character at start was escaped itself.
+        '''
+        buf = self.buf
+        escpos = end - 1
+        while escpos >= start and buf[escpos] == self.BACKSLASH:
+            escpos -= 1
+        if escpos < start:
+            return (end - start + escaped) % 2 == 1
+        return (end - escpos) % 2 == 0
+
+    def string_end(self, start, escaped=False):
+        '''
+        Returns the index of the first unescaped quote from start on, or -1.
+        '''
+        while True:
+            end = self.find_quote(start)
+            if end == -1 or not self.is_escaped(end, start, escaped):
+                return end
+            start = end + 1
+            escaped = False
+
+    def text(self, start, end):
+        return self.buf[start:end]
+
+    def join(self, parts):
+        return ''.join(parts)
 
     def global_pos(self, offset):
         return self.discarded + offset
@@ -39,16 +86,115 @@ class Buffer(object):
         return len(self.buf)
 
     def __add__(self, new_buf):
-        if not self.search():
+        match = self.search()
+        if not match:
             # nothing left in this buffer, we take the new buffer, noting offset
             new_buf.discarded = self.discarded + len(self.buf)
+            new_buf.open_string = self.open_string
+            new_buf.skip = self.skip
             return new_buf
         else:
-            # TODO: do this more intelligently, dropping everything before pos
-            # we need to combine the two buffers
-            self.buf += new_buf.buf
+            # we need to combine the two buffers, but only keep the unconsumed
+            # tail, so the buffer never grows past the longest token plus a chunk
+            start = match.start()
+            self.discarded += start
+            self.pos = 0
+            self.extend(start, new_buf.buf)
             return self
 
+    def extend(self, start, data):
+        self.buf = self.buf[start:] + data
+
+
+class BytesBuffer(Buffer):
+    '''
+    Buffer tokenizing utf-8 bytes (or another bytes-like object) directly.
+
+    All structural JSON characters are ASCII, and ASCII bytes never occur
+    inside a multibyte utf-8 sequence, so we can find the tokens on the raw
+    bytes and only decode each token once it is complete.  This saves
+    decoding whole chunks, and characters split between two chunks are
+    simply decoded once the token is whole.  Positions are byte offsets.
+    '''
+    # runs of non-ASCII bytes are kept together, so a stray character outside
+    # of a string is reported whole as an unexpected symbol
+    LEXEME_RE = re.compile(rb'[a-z0-9eE\.\+-]+|[\x80-\xff]+|\S')
+    SKIP_RE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|["\[\]{}]', re.S)
+    QUOTE_RE = re.compile(rb'"')
+    QUOTE = ord('"')
+    BACKSLASH = ord('\\')
+    OPENERS = b'[{'
+    # whether buf is a bytearray allocated here, which can be changed in
+    # place, rather than data passed in by the caller
+    owned = False
+
+    def find_quote(self, start):
+        # memoryview and mmap have no find(), but re can search any bytes-like
+        match = self.QUOTE_RE.search(self.buf, start)
+        return match.start() if match else -1
+
+    def text(self, start, end):
+        return str(self.buf[start:end], 'utf-8')
+
+    def join(self, parts):
+        return str(b''.join(parts), 'utf-8')
+
+    def extend(self, start, data):
+        # a bytearray drops its head and appends in amortized linear time,
+        # where concatenating bytes would copy the whole tail on every chunk
+        if self.owned:
+            del self.buf[:start]
+        else:
+            self.buf = bytearray(self.buf[start:])
+            self.owned = True
+        self.buf += data
+
+
+class MappedBuffer(BytesBuffer):
+    '''
+    BytesBuffer over a window of data held whole, such as a memory mapped
+    file, through a memoryview.  Instead of combining buffers, the window
+    grows over the data in place, so nothing is ever copied into a chunk
+    and positions stay absolute.
+    '''
+    def __init__(self, data):
+        self.view = memoryview(data)
+        super(MappedBuffer, self).__init__(self.view[:0])
+
+    def advance(self, size):
+        '''
+        Makes the next size bytes of the data visible, returns how many were.
+        '''
+        end = min(len(self.buf) + size, len(self.view))
+        size = end - len(self.buf)
+        self.buf = self.view[:end]
+        return size
+
+
+class OpenString(object):
+    '''
+    A string token still open at the end of a buffer: its position, the raw
+    data scanned so far and whether that data ends in an escape.  It is passed
+    on to the next buffer, so scanning resumes where it stopped instead of
+    starting over from the opening quote with every chunk.  Strings being
+    skipped don't keep their data.
+    '''
+    def __init__(self, pos, keep=True):
+        self.pos = pos
+        self.parts = []
+        self.escaped = False
+        self.keep = keep
+
+    def add(self, buffer, start, scan_start):
+        '''
+        Takes the rest of the buffer from start, already scanned from scan_start.
+        '''
+        if self.keep:
+            self.parts.append(buffer.buf[start:])
+        self.escaped = buffer.is_escaped(len(buffer), scan_start, self.escaped)
+        buffer.open_string = self
+        buffer.pos = len(buffer)
+
 
 def get_tokens(buffer, more_data=True):
     """
@@ -62,276 +208,631 @@ def get_tokens(buffer, more_data=True):
 
     This is to ensure two chunks cut, such as " 19" and ".4" are properly
     parsed as "19.4", not two distinct tokens "19" and ".4".
+
+    A string left open at the end of the buffer is kept as buffer.open_string,
+    so the next buffer only scans the new data for its end.
+
+    While buffer.skip is set (the parser can set it between two tokens), the
+    value being parsed is skipped: only brackets and strings are scanned to
+    find where it ends, and no tokens are returned for it.
     """
+    buf = buffer.buf
+    open_string = buffer.open_string
+    if open_string is not None:
+        start = buffer.pos
+        end = buffer.string_end(start, open_string.escaped)
+        if end == -1:
+            if more_data:
+                open_string.add(buffer, start, start)
+            return
+        buffer.open_string = None
+        buffer.pos = end + 1
+        if open_string.keep:
+            open_string.parts.append(buf[start:end + 1])
+            yield open_string.pos, buffer.join(open_string.parts)
     while True:
+        if buffer.skip:
+            match = buffer.skip_search()
+            if not match:
+                buffer.pos = len(buffer)
+                return
+            pos = match.start()
+            char = buf[pos]
+            if char == buffer.QUOTE:
+                if match.end() == pos + 1:
+                    if more_data:
+                        OpenString(None, keep=False).add(buffer, pos, pos + 1)
+                    return
+                buffer.pos = match.end()
+            else:
+                buffer.pos = pos + 1
+                buffer.skip += 1 if char in buffer.OPENERS else -1
+            continue
         match = buffer.search()
         if match:
-            lexeme = match.group()
-            if lexeme == '"':
-                pos = match.start()
-                start = pos + 1
-                while True:
-                    try:
-                        end = buffer.index('"', start)
-                        escpos = end - 1
-                        while buffer.buf[escpos] == '\\':
-                            escpos -= 1
-                        if (end - escpos) % 2 == 0:
-                            start = end + 1
-                        else:
-                            break
-                    except ValueError:
-                        return
-                yield buffer.global_pos(pos), buffer.buf[pos:end + 1]
+            pos = match.start()
+            if buf[pos] == buffer.QUOTE:
+                end = buffer.string_end(pos + 1)
+                if end == -1:
+                    if more_data:
+                        OpenString(buffer.global_pos(pos)).add(buffer, pos, pos + 1)
+                    return
+                yield buffer.global_pos(pos), buffer.text(pos, end + 1)
                 buffer.pos = end + 1
             else:
                 if more_data and (match.end() == len(buffer)):
                     return
                 buffer.pos = match.end()
-                yield buffer.global_pos(match.start()), lexeme
+                yield buffer.global_pos(pos), buffer.text(pos, match.end())
         else:
             return
 
 
 class Lexer(object):
     """
-    This takes a stream and can be used to iterator over lexical tokens from it.
-    Uses Buffer and get_token to do the work on the in-memory data, and handles
-    combining multiple data chunks from the network.
+    This takes a stream and can be used to iterate over lexical tokens from
+    it, the (position, symbol) pairs of get_tokens.  Chunks are read with
+    common.read_chunk and combined into the buffer as Parser.feed does.
+
+    Streams returning bytes are tokenized as utf-8 bytes with BytesBuffer, and
+    token positions are then byte offsets.  Streams returning str (such as a
+    utils.streamdecoder.DecodingStreamReader) are tokenized as text.
+
+    If a common.ParseStats is given as stats, reads and tokens are counted
+    into it.  aclose stops the tokens before the end of the stream.
     """
 
-    def __init__(self, stream, buf_size=BUFSIZE):
+    def __init__(self, stream, buf_size=BUFSIZE, stats=None):
         self.stream = stream
         self.buf_size = buf_size
-        self.stream_done = False
+        self.stats = stats
         self.buffer = None
+        self.tokens = iter(())
+        self.stream_done = False
+        self.closed = False
 
-    async def read_buffer(self):
-        # TODO: this breaks if a utf-8 character is split in the middle of a chunk boundary
-        # Need a good asyncio solution here.
-        data = await self.stream.read(self.buf_size)
-        if isinstance(data, (bytes, bytearray)):
-            data = data.decode('utf-8')
-        return Buffer(data)
-
-    async def __aiter__(self):
-        # __iter__ may be called multiple times on one object, just initialize once
-        if self.buffer is None:
-            self.buffer = await self.read_buffer()
-            self.parser = get_tokens(self.buffer)
+    def __aiter__(self):
         return self
 
     async def next(self):
-        # Make sure we set up the iterator once if people are calling by hand
-        try:
-            if self.buffer is None:
-                await self.__aiter__()
-            return await self.__anext__()
-        except StopIteration:
-            import pdb; pdb.set_trace()
-
-    def _check_end(self):
-        if self.buffer.search():
-            raise common.IncompleteJSONError('Incomplete string lexeme')
-        else:
-            raise StopAsyncIteration
+        return await self.__anext__()
 
     async def __anext__(self):
-        # if we hit the end of the parsing on the last call, then we must successfully finish
-        # or die with the error that the json doesn't close properly
-        if self.stream_done:
-            self._check_end()
-        try:
-            return next(self.parser)
-        except StopIteration:
-            # try to get more data
-            more_data = await self.read_buffer()
-            if len(more_data) > 0:
-                self.buffer = self.buffer + more_data
-                self.parser = get_tokens(self.buffer)
-                return await self.next()
-            else:
-                self.stream_done = True
-                try:
-                    return next(get_tokens(self.buffer, more_data=False))
-                except StopIteration:
-                    self._check_end()
+        while not self.closed:
+            token = next(self.tokens, None)
+            if token is not None:
+                if self.stats is not None:
+                    self.stats.tokens += 1
+                return token
+            if self.stream_done:
+                if self.buffer.open_string is not None or self.buffer.search():
+                    raise common.IncompleteJSONError('Incomplete string lexeme')
+                break
+            await self._read()
+        raise StopAsyncIteration
+
+    async def aclose(self, close_stream=False):
+        '''
+        Stops reading and tokenizing, and closes the stream if asked, see
+        common.release_stream.
+        '''
+        self.closed = True
+        await common.release_stream(self.stream, close_stream)
+
+    async def _read(self):
+        if self.stats is None:
+            data = await common.read_chunk(self.stream, self.buf_size)
+        else:
+            start = time.perf_counter()
+            data = await common.read_chunk(self.stream, self.buf_size)
+            self.stats.read(len(data), time.perf_counter() - start)
+        buffer = Buffer(data) if isinstance(data, str) else BytesBuffer(data)
+        if self.buffer is None:
+            self.buffer = buffer
+        elif len(buffer) > 0:
+            self.buffer = self.buffer + buffer
+        self.stream_done = len(buffer) == 0
+        if self.stats is not None:
+            self.stats.peak_buffer = max(self.stats.peak_buffer, len(self.buffer))
+        self.tokens = get_tokens(self.buffer, more_data=not self.stream_done)
+
+
+# One escape sequence in a JSON string: a surrogate pair written as two \\u
+# escapes, a single \\u escape or a one character escape.
+ESCAPE_RE = re.compile(
+    r'\\u([dD][89abAB][0-9a-fA-F]{2})\\u([dD][c-fC-F][0-9a-fA-F]{2})'
+    r'|\\u([0-9a-fA-F]{4})|\\(.)', re.S)
+ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# How many distinct map keys unescape_key remembers
+MAX_CACHED_KEYS = 4096
+
+
+def _unescape_match(match):
+    high, low, code, char = match.groups()
+    if char is not None:
+        return ESCAPES.get(char, char)
+    if code is not None:
+        return chr(int(code, 16))
+    return chr(0x10000 + ((int(high, 16) - 0xd800) << 10) + int(low, 16) - 0xdc00)
 
 
 def unescape(s):
-    start = 0
-    result = ''
-    while start < len(s):
-        pos = s.find('\\', start)
-        if pos == -1:
-            if start == 0:
-                return s
-            result += s[start:]
-            break
-        result += s[start:pos]
-        pos += 1
-        esc = s[pos]
-        if esc == 'u':
-            result += chr(int(s[pos + 1:pos + 5], 16))
-            pos += 4
-        elif esc == 'b':
-            result += '\b'
-        elif esc == 'f':
-            result += '\f'
-        elif esc == 'n':
-            result += '\n'
-        elif esc == 'r':
-            result += '\r'
-        elif esc == 't':
-            result += '\t'
-        else:
-            result += esc
-        start = pos + 1
-    return result
+    '''
+    Decodes the escape sequences of a JSON string, without its quotes.  The
+    runs of text between escapes are copied by the regex engine, not one by
+    one.  Unknown escapes decode to the escaped character.
+    '''
+    if '\\' not in s:
+        return s
+    return ESCAPE_RE.sub(_unescape_match, s)
 
 
-class parse_value:
-    def __init__(self, lexer, symbol=None, pos=0):
-        self.lexer = lexer
-        self.symbol = symbol
-        self.pos = pos
-        self.done = False
-        self.sub_parser = None
+def unescape_string(symbol):
+    '''
+    Decodes a string token, quotes included.  Strings with escapes go through
+    the C string scanner of the json module, falling back to unescape for
+    escapes it rejects.
+    '''
+    if '\\' not in symbol:
+        return symbol[1:-1]
+    try:
+        return scanstring(symbol, 1, False)[0]
+    except ValueError:
+        return unescape(symbol[1:-1])
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_KEYS)
+def unescape_key(symbol):
+    '''
+    Decodes a map key token, quotes included.  Keys repeat across records, so
+    recent ones are cached: they skip decoding and return the same str
+    object, which the built objects then share.
+    '''
+    return unescape_string(symbol)
+
 
-    async def __aiter__(self):
+# A number as JSON allows it: no sign but '-', no leading zeros, digits on
+# both sides of the dot.  int and Decimal are laxer, and so is LEXEME_RE.
+NUMBER_RE = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?\Z')
+
+# Grammar states of TokenParser, naming what the next token has to be
+VALUE = 0           # any value
+ARRAY_START = 1     # first array item or ']'
+ARRAY_NEXT = 2      # ',' or ']' after an array item
+MAP_START = 3       # first map key or '}'
+MAP_KEY = 4         # map key after ','
+MAP_COLON = 5       # ':' after a map key
+MAP_NEXT = 6        # ',' or '}' after a map value
+
+
+class TokenParser(object):
+    '''
+    Grammar state machine turning lexical tokens into basic parse events.
+
+    Nesting is tracked with an explicit stack of the states to return to once
+    a value is complete, so the whole document is parsed in one coroutine with
+    no task per container.  Each token fed to `token` produces at most one
+    event, or None for pure punctuation.
+    '''
+    # set when a token started a container the lexer should skip
+    skipping = False
+
+    def __init__(self, number=common.number):
+        self.state = VALUE
+        self.stack = []
+        self.number = number
+
+    def token(self, pos, symbol):
+        state = self.state
+        if state == VALUE:
+            return self._value(pos, symbol)
+        elif state == ARRAY_START:
+            if symbol == ']':
+                return self._end('end_array')
+            return self._value(pos, symbol)
+        elif state == ARRAY_NEXT:
+            if symbol == ',':
+                self.state = VALUE
+                return None
+            if symbol == ']':
+                return self._end('end_array')
+        elif state == MAP_START or state == MAP_KEY:
+            if symbol == '}' and state == MAP_START:
+                return self._end('end_map')
+            if symbol[0] == '"':
+                self.state = MAP_COLON
+                return self._key(symbol)
+        elif state == MAP_COLON:
+            if symbol == ':':
+                self.state = VALUE
+                return None
+        elif state == MAP_NEXT:
+            if symbol == ',':
+                self.state = MAP_KEY
+                return None
+            if symbol == '}':
+                return self._end('end_map')
+        raise UnexpectedSymbol(symbol, pos)
+
+    def _key(self, symbol):
+        return ('map_key', unescape_key(symbol))
+
+    def _value(self, pos, symbol):
+        if symbol == '[':
+            self.stack.append(ARRAY_NEXT)
+            self.state = ARRAY_START
+            return ('start_array', None)
+        elif symbol == '{':
+            self.stack.append(MAP_NEXT)
+            self.state = MAP_START
+            return ('start_map', None)
+        self.state = self.stack[-1] if self.stack else VALUE
+        if symbol == 'null':
+            return ('null', None)
+        elif symbol == 'true':
+            return ('boolean', True)
+        elif symbol == 'false':
+            return ('boolean', False)
+        elif symbol[0] == '"':
+            return ('string', unescape_string(symbol))
+        else:
+            if NUMBER_RE.match(symbol) is None:
+                raise UnexpectedSymbol(symbol, pos)
+            try:
+                return ('number', self.number(symbol))
+            except (decimal.InvalidOperation, ValueError):
+                raise UnexpectedSymbol(symbol, pos)
+
+    def _end(self, event):
+        self.stack.pop()
+        self.state = self.stack[-1] if self.stack else VALUE
+        return (event, None)
+
+    def close(self):
+        '''
+        Call when the tokens run out, to make sure no value was left open.
+        '''
+        if self.state != VALUE or self.stack:
+            raise common.IncompleteJSONError('Incomplete JSON data')
+
+
+class RecordPrefix(str):
+    '''
+    A prefix for PrefixTokenParser where records are built: of a map there,
+    only the values of the keys in `fields` are needed, any other value is
+    needed whole.
+    '''
+    def __new__(cls, prefix, fields):
+        self = super(RecordPrefix, cls).__new__(cls, prefix)
+        self.fields = tuple(fields)
         return self
 
-    async def __anext__(self):
-        if not self.symbol:
-            self.pos, self.symbol = await self.lexer.next()
-
-        if self.done:
-            raise StopAsyncIteration
-        try:
-            if self.sub_parser:
-                return await self.sub_parser.next()
-            if self.symbol == 'null':
-                self.done = True
-                return ('null', None)
-            elif self.symbol == 'true':
-                self.done = True
-                return ('boolean', True)
-            elif self.symbol == 'false':
-                self.done = True
-                return ('boolean', False)
-            elif self.symbol == '[':
-                self.sub_parser = parse_array(self.lexer)
-                return ('start_array', None)
-            elif self.symbol == '{':
-                self.sub_parser = parse_object(self.lexer)
-                return ('start_map', None)
-            elif self.symbol[0] == '"':
-                self.done = True
-                return ('string', unescape(self.symbol[1:-1]))
+
+class PrefixTokenParser(TokenParser):
+    '''
+    TokenParser only producing events for the values under the given
+    prefixes, and for the containers and keys leading to them.  Other values
+    are skipped without events: scalars are not converted, and containers
+    are left to the lexer to skip by balancing brackets, so they are not
+    validated either.  For a RecordPrefix, the values under the fields are
+    wanted if the value there is a map, else the whole value.
+    '''
+    def __init__(self, prefixes, number=common.number):
+        super(PrefixTokenParser, self).__init__(number)
+        self.targets = set()
+        self.records = set()
+        for prefix in prefixes:
+            if isinstance(prefix, RecordPrefix):
+                self.records.add(prefix)
+                self.targets.update(prefix + '.' + field if prefix else field for field in prefix.fields)
             else:
-                try:
-                    self.done = True
-                    return ('number', common.number(self.symbol))
-                except decimal.InvalidOperation:
-                    raise UnexpectedSymbol(self.symbol, self.pos)
-        except StopIteration:
+                self.targets.add(prefix)
+        # the targets and all the prefixes leading to them
+        self.wanted = set()
+        for prefix in self.targets | self.records:
+            parts = prefix.split('.') if prefix else []
+            for i in range(len(parts) + 1):
+                self.wanted.add('.'.join(parts[:i]))
+        # prefix of the next value, and of each open container
+        self.prefix = ''
+        self.prefixes = []
+        # stack depth of the target container we are in, if any
+        self.inside = None
+
+    def _key(self, symbol):
+        key = unescape_key(symbol)
+        parent = self.prefixes[-1]
+        self.prefix = parent + '.' + key if parent else key
+        return ('map_key', key)
+
+    def _value(self, pos, symbol):
+        prefix = self.prefix
+        if self.inside is None and prefix not in self.wanted:
+            if symbol in (']', '}', ',', ':'):
+                raise UnexpectedSymbol(symbol, pos)
+            self.state = self.stack[-1] if self.stack else VALUE
+            if symbol == '[' or symbol == '{':
+                self.skipping = True
+            return None
+        if symbol == '[' or symbol == '{':
+            if self.inside is None and (prefix in self.targets or symbol == '[' and prefix in self.records):
+                self.inside = len(self.stack)
+            self.prefixes.append(prefix)
+            if symbol == '[':
+                self.prefix = prefix + '.item' if prefix else 'item'
+        return super(PrefixTokenParser, self)._value(pos, symbol)
+
+    def _end(self, event):
+        self.prefix = self.prefixes.pop()
+        if self.inside == len(self.stack) - 1:
+            self.inside = None
+        return super(PrefixTokenParser, self)._end(event)
+
+
+class Parser(object):
+    '''
+    Push parser, independent of any IO.  Feed it chunks of input as they
+    arrive, either utf-8 bytes (any bytes-like object) or str but not a mix,
+    and it returns the list of events each chunk completed.  Call close once
+    the input is over, to get the last events and make sure the document was
+    complete.  Chunks must not be modified after they have been fed.
+
+    Example, from an asyncio.Protocol::
+
+        def data_received(self, data):
+            for event, value in self.parser.feed(data):
+                ...
+
+    If prefixes are given, only the values under them (and the containers and
+    keys leading to them) produce events, the rest is skipped by the lexer.
+    Numbers are converted as set by use_float and number_factory, see
+    common.get_number_factory.
+    '''
+    def __init__(self, prefixes=None, use_float=False, number_factory=None):
+        self.buffer = None
+        # count of the tokens seen, only kept once set to a number
+        self.tokens = None
+        number = common.get_number_factory(use_float, number_factory)
+        if prefixes is None:
+            self.parser = TokenParser(number)
+        else:
+            self.parser = PrefixTokenParser(prefixes, number)
+
+    def feed(self, data):
+        buffer = Buffer(data) if isinstance(data, str) else BytesBuffer(data)
+        if self.buffer is None:
+            self.buffer = buffer
+        elif len(buffer) > 0:
+            self.buffer = self.buffer + buffer
+        return self._events(get_tokens(self.buffer))
+
+    def close(self):
+        if self.buffer is None:
+            self.buffer = Buffer('')
+        events = self._events(get_tokens(self.buffer, more_data=False))
+        if self.buffer.open_string is not None or self.buffer.search():
+            raise common.IncompleteJSONError('Incomplete string lexeme')
+        if self.buffer.skip:
             raise common.IncompleteJSONError('Incomplete JSON data')
+        self.parser.close()
+        return events
+
+    def _events(self, tokens):
+        if self.tokens is not None:
+            tokens = self._count(tokens)
+        parser = self.parser
+        token = parser.token
+        events = []
+        for pos, symbol in tokens:
+            event = token(pos, symbol)
+            if event is not None:
+                events.append(event)
+            elif parser.skipping:
+                # have the lexer skip the container that just started
+                parser.skipping = False
+                self.buffer.skip = 1
+        return events
+
+    def _count(self, tokens):
+        for token in tokens:
+            self.tokens += 1
+            yield token
+
+
+class MappedParser(Parser):
+    '''
+    Parser over data held whole, such as a memory mapped file, which it
+    tokenizes in place through a MappedBuffer.  Rather than being fed chunks,
+    it is advanced over the data: advance returns the events completed by
+    the next size bytes, or None once there is no data left, then call close
+    as with Parser.
+    '''
+    def __init__(self, data, prefixes=None, use_float=False, number_factory=None):
+        super(MappedParser, self).__init__(prefixes, use_float, number_factory)
+        self.buffer = MappedBuffer(data)
 
-    async def next(self):
-        # Make sure we set up the iterator once if people are calling by hand
-        return await self.__anext__()
+    def feed(self, data):
+        raise TypeError('MappedParser is advanced over its data, not fed')
 
+    def advance(self, size):
+        if not self.buffer.advance(size):
+            return None
+        return self._events(get_tokens(self.buffer))
 
-@aiogen
-async def parse_array(send, lexer):
-    try:
-        pos, symbol = await lexer.next()
-        if symbol != ']':
-            while True:
-                async for event in parse_value(lexer, symbol, pos):
-                    await send(event)
-                pos, symbol = await lexer.next()
-                if symbol == ']':
-                    break
-                if symbol != ',':
-                    raise UnexpectedSymbol(symbol, pos)
-                pos, symbol = await lexer.next()
-        await send('end_array', None)
-    except StopIteration:
-        raise common.IncompleteJSONError('Incomplete JSON data')
-
-
-@aiogen
-async def parse_object(send, lexer):
-    try:
-        pos, symbol = await lexer.next()
-        if symbol != '}':
-            while True:
-                if symbol[0] != '"':
-                    raise UnexpectedSymbol(symbol, pos)
-                await send(('map_key', unescape(symbol[1:-1])))
-                pos, symbol = await lexer.next()
-                if symbol != ':':
-                    raise UnexpectedSymbol(symbol, pos)
-                async for event in parse_value(lexer, None, pos):
-                    await send(event)
-                pos, symbol = await lexer.next()
-                if symbol == '}':
-                    break
-                if symbol != ',':
-                    raise UnexpectedSymbol(symbol, pos)
-                pos, symbol = await lexer.next()
-        await send(('end_map', None))
-    except StopAsyncIteration:
-        raise common.IncompleteJSONError('Incomplete JSON data')
-
-
-class basic_parse:
+
+def basic_parse_batches(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None,
+                        stats=None):
+    '''
+    Iterator yielding lists of unprefixed events, one list with all the events
+    completed by each chunk read from the stream, so consumers pay for one
+    await per chunk rather than one per event.
+
+    Parameters:
+
+    - stream: an asyncio stream with JSON input, or a
+      utils.mappedstream.MappedStreamReader, tokenized in place
+    - buf_size: bytes per read, or a common.AdaptiveReadSize
+    - prefixes: if given, only produce events on the way to these prefixes
+    - use_float: convert numbers with a fraction or exponent to float, not Decimal
+    - number_factory: function converting the text of each number
+    - stats: a common.ParseStats to measure the parse into
+    '''
+    if isinstance(stream, MappedStreamReader):
+        parser = MappedParser(stream.data[stream.pos:], prefixes, use_float, number_factory)
+        if isinstance(buf_size, common.AdaptiveReadSize):
+            # all the data is ready
+            buf_size = buf_size.max_size
+        return common.advance_batches(parser, buf_size, stats)
+    return common.read_batches(stream, Parser(prefixes, use_float, number_factory), buf_size, stats)
+
+
+def basic_parse(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None, stats=None):
     '''
     Iterator yielding unprefixed events.
 
     Parameters:
 
     - stream: an asyncio stream with JSON input
+    - prefixes: if given, only produce events on the way to these prefixes
+    - use_float: convert numbers with a fraction or exponent to float, not Decimal
+    - number_factory: function converting the text of each number
+    - stats: a common.ParseStats to measure the parse into
     '''
-    def __init__(self, stream, buf_size=BUFSIZE):
-        self.stream = stream
-        self.buf_size = buf_size
-        self.lexer = None
-        self.parser = None
+    return common.unbatch(basic_parse_batches(stream, buf_size, prefixes, use_float, number_factory, stats))
 
-    async def __aiter__(self):
-        if self.lexer is None:
-            self.lexer = await Lexer(self.stream, self.buf_size).__aiter__()
-            self.parser = parse_value(self.lexer)
-        return self
 
-    async def __anext__(self):
-        try:
-            value = await self.parser.next()
-            return value
-        except StopAsyncIteration:
-            # go to the next value
-            self.parser = parse_value(self.lexer)
-            # if next also fails, then we are at the end...
-            return await self.parser.next()
+def parse(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None, stats=None):
+    '''
+    Backend-specific wrapper for ijson.common.parse.
+    '''
+    return common.parse(basic_parse(stream, buf_size, prefixes, use_float, number_factory, stats))
 
-    async def next(self):
-        # Make sure we set up the iterator once if people are calling by hand
-        if self.lexer is None:
-            await self.__aiter__()
-        return await self.__anext__()
 
+def parse_batches(stream, buf_size=BUFSIZE, use_float=False, number_factory=None, stats=None):
+    '''
+    Backend-specific wrapper for common.parse_batches.
+    '''
+    return common.parse_batches(basic_parse_batches(
+        stream, buf_size, use_float=use_float, number_factory=number_factory, stats=stats))
 
-def parse(stream, buf_size=BUFSIZE):
+
+def items(stream, prefix, use_float=False, number_factory=None, dict_factory=None, list_factory=None,
+          into=None, stats=None, limit=None, stop_after_prefix_closed=False, close_stream=False):
     '''
-    Backend-specific wrapper for ijson.common.parse.
+    Backend-specific wrapper for ijson.common.items.  Parts of the document
+    which can't contain the prefix are skipped without building events, and
+    with `into`, so are the values of keys which aren't fields of the record.
+    The prefix can also be a pattern for, or a, common.Selector, then values
+    are returned by common.select_items.
+    '''
+    prefixes = _prefixes(prefix, into)
+    if common.is_pattern(prefix):
+        events = basic_parse(stream, prefixes=prefixes, use_float=use_float, number_factory=number_factory,
+                             stats=stats)
+        return common.select_items(events, prefix, dict_factory, list_factory, into, stats, limit,
+                                   stop_after_prefix_closed, close_stream)
+    events = parse(stream, prefixes=prefixes, use_float=use_float, number_factory=number_factory, stats=stats)
+    return common.items(events, prefix, dict_factory, list_factory, into, stats,
+                        limit, stop_after_prefix_closed, close_stream)
+
+
+def _prefixes(prefix, into=None):
+    '''
+    Returns the prefixes to produce events for, to find the values under a
+    prefix or matching a pattern, or None if the pattern can match anywhere.
+    With `into`, only the fields of the maps there are needed.
+    '''
+    if common.is_pattern(prefix):
+        prefix = common.get_selector(prefix).prefix
+        if prefix is None:
+            return None
+    if into is None:
+        return [prefix]
+    return [RecordPrefix(prefix, common.record_fields(into))]
+
+
+def items_multi(stream, targets, use_float=False, number_factory=None, dict_factory=None, list_factory=None):
+    '''
+    Backend-specific wrapper for common.items_multi.  Parts of the document
+    which can't contain any of the prefixes are skipped without building events.
+    '''
+    events = parse(stream, prefixes=list(targets), use_float=use_float, number_factory=number_factory)
+    return common.items_multi(events, targets, dict_factory, list_factory)
+
+
+def documents(stream, prefix=None, buf_size=BUFSIZE, use_float=False, number_factory=None,
+              dict_factory=None, list_factory=None):
+    '''
+    Backend-specific wrapper for common.documents.  With a prefix, parts of
+    the documents which can't contain it are skipped without building events.
+    '''
+    prefixes = None if prefix is None else _prefixes(prefix)
+    events = parse(stream, buf_size, prefixes, use_float, number_factory)
+    return common.documents(events, prefix, dict_factory, list_factory)
+
+
+def jsonl(stream, prefix=None, buf_size=BUFSIZE, use_float=False, number_factory=None):
+    '''
+    Wrapper for common.jsonl, the fast path for newline delimited JSON,
+    which doesn't depend on the backend.
+    '''
+    return common.jsonl(stream, buf_size, prefix, use_float, number_factory)
+
+
+def parallel_jsonl(stream, executor=None, prefix=None, buf_size=BUFSIZE, block_size=1024 * 1024,
+                   use_float=False, number_factory=None, ordered=True, max_pending=None):
+    '''
+    Wrapper for common.parallel_jsonl, which doesn't depend on the backend.
+    '''
+    return common.parallel_jsonl(stream, executor, buf_size, block_size, prefix,
+                                 use_float, number_factory, ordered, max_pending)
+
+
+def basic_parse_bytes(data, prefixes=None, use_float=False, number_factory=None):
+    '''
+    Returns the list of unprefixed events of a document already in memory,
+    str or utf-8 bytes, parsed synchronously: no stream, no awaits.
+    Parameters are as for basic_parse.
+    '''
+    parser = Parser(prefixes, use_float, number_factory)
+    return parser.feed(data) + parser.close()
+
+
+def parse_bytes(data, prefixes=None, use_float=False, number_factory=None):
+    '''
+    Synchronous parse of a document already in memory, returning a list.
+    '''
+    return common.parse_events(basic_parse_bytes(data, prefixes, use_float, number_factory))
+
+
+def items_bytes(data, prefix, use_float=False, number_factory=None, dict_factory=None, list_factory=None,
+                into=None):
+    '''
+    Synchronous items of a document already in memory, returning a list.
+    The prefix can be a pattern, as for items.
+    '''
+    events = parse_bytes(data, _prefixes(prefix, into), use_float, number_factory)
+    return common.items_events(events, prefix, dict_factory, list_factory, into)
+
+
+def basic_parse_bytes_async(data, *args, **kwargs):
+    '''
+    basic_parse_bytes as an iterator like basic_parse's, for code written
+    against streams.  The document is parsed at once, before returning.
+    '''
+    return common.values(basic_parse_bytes(data, *args, **kwargs))
+
+
+def parse_bytes_async(data, *args, **kwargs):
+    '''
+    parse_bytes as an iterator like parse's.
     '''
-    return common.parse(basic_parse(stream, buf_size=buf_size))
+    return common.values(parse_bytes(data, *args, **kwargs))
 
 
-def items(stream, prefix):
+def items_bytes_async(data, prefix, *args, **kwargs):
     '''
-    Backend-specific wrapper for ijson.common.items.
+    items_bytes as an iterator like items'.
     '''
-    return common.items(parse(stream), prefix)
+    return common.values(items_bytes(data, prefix, *args, **kwargs))
@@ -21,6 +21,9 @@ SIMPLE_MAP_JSON = '{"foo": "bar", "age": 17}'
 
 SIMPLE_MAP_EVENTS = [('start_map', None), ('map_key', 'foo'), ('string', 'bar'), ('map_key', 'age'), ('number', 17), ('end_map', None)]
 
+SIMPLE_MAP_PREFIXED_EVENTS = [('', 'start_map', None), ('', 'map_key', 'foo'), ('foo', 'string', 'bar'),
+                              ('', 'map_key', 'age'), ('age', 'number', 17), ('', 'end_map', None)]
+
 MAP_JSON = b'''
 {
   "docs": [
@@ -0,0 +1,39 @@
+"""
+Helpers to drive the parsers from in-memory streams in tests, no server needed
+"""
+import asyncio
+
+from ...utils.memorystream import MemoryStreamReader
+
+
+async def collect(iterator):
+    """
+    Drain an async iterator by calling next() by hand, returning a list of
+    everything it produced.
+    """
+    results = []
+    while True:
+        try:
+            results.append(await iterator.next())
+        except StopAsyncIteration:
+            return results
+
+
+class with_memory_reader:
+    """
+    Use as a decorator over an async function, like server.with_reader.
+    The function will get one argument - a MemoryStreamReader with the data
+    passed in the constructor, returning at most chunk_size bytes per read.
+    """
+    def __init__(self, data, chunk_size=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def __call__(self, func):
+        def f():
+            loop = asyncio.get_event_loop()
+            stream = MemoryStreamReader(self.data, self.chunk_size)
+            loop.run_until_complete(func(stream))
+        return f
@@ -0,0 +1,134 @@
+# -*- coding:utf-8 -*-
+import asyncio
+
+import pytest
+
+from ... import backends, common
+from .. import get_backend, default_backend
+
+from .data import *
+from .memory import collect, with_memory_reader
+
+
+def available_backends():
+    found = []
+    for name in backends.BACKENDS:
+        try:
+            found.append(get_backend(name))
+        except ImportError:
+            pass
+    return found
+
+
+BACKENDS = available_backends()
+
+
+@pytest.fixture(params=backends.BACKENDS)
+def backend(request):
+    '''
+    Every backend in turn, a backend which can't be used here being skipped
+    with the reason, rather than left out silently.
+    '''
+    try:
+        return get_backend(request.param)
+    except ImportError as e:
+        pytest.skip('%s backend unavailable: %s' % (request.param, e))
+
+
+def test_python_backend_always_available():
+    assert get_backend('python') in BACKENDS
+
+
+def test_unknown_backend():
+    with pytest.raises(ImportError):
+        get_backend('nonesuch')
+
+
+def test_default_backend_from_environment(monkeypatch):
+    monkeypatch.setenv('AIOJSON_BACKEND', 'python')
+    assert default_backend() is get_backend('python')
+    monkeypatch.delenv('AIOJSON_BACKEND')
+    assert default_backend() is BACKENDS[0]
+
+
+@pytest.mark.parametrize('data, events', [
+    (SIMPLE_JSON, SIMPLE_EVENTS),
+    (ARRAY_JSON, ARRAY_EVENTS),
+    (SIMPLE_MAP_JSON, SIMPLE_MAP_EVENTS),
+    (MAP_JSON, MAP_EVENTS),
+    ('', []),
+])
+def test_basic_parse_identical(backend, data, events):
+    @with_memory_reader(data, chunk_size=3)
+    async def check(stream):
+        assert await collect(backend.basic_parse(stream, buf_size=3)) == events
+    check()
+
+
+def test_basic_parse_incomplete(backend):
+    @with_memory_reader('{"a": [1, 2')
+    async def check(stream):
+        with pytest.raises(common.IncompleteJSONError):
+            await collect(backend.basic_parse(stream))
+    check()
+
+
+def test_parser_from_protocol(backend):
+    class JSONProtocol(asyncio.Protocol):
+        def __init__(self):
+            self.parser = backend.Parser()
+            self.events = []
+
+        def data_received(self, data):
+            self.events += self.parser.feed(data)
+
+        def eof_received(self):
+            self.events += self.parser.close()
+
+    protocol = JSONProtocol()
+    for i in range(0, len(MAP_JSON), 7):
+        protocol.data_received(MAP_JSON[i:i + 7])
+    protocol.eof_received()
+    assert protocol.events == MAP_EVENTS
+
+
+@pytest.mark.parametrize('data', [
+    b'+5', b'1.', b'.5', b'1.e5', b'-', b'[01]', b'[-0.]', b'{"a": 1e}', b'[Infinity]', b'[NaN]',
+])
+def test_invalid_numbers(backend, data):
+    with pytest.raises(common.JSONError):
+        backend.basic_parse_bytes(data)
+
+
+def test_number_factory_error(backend):
+    with pytest.raises(common.JSONError):
+        backend.basic_parse_bytes(b'[1.5, 2, "x"]', number_factory=int)
+    parser = backend.Parser(number_factory=int)
+    with pytest.raises(common.JSONError):
+        parser.feed(b'[2, 1.5')
+        parser.close()
+
+
+def test_backend_signatures_identical():
+    # compared from the sources, as yajl2 can only be imported with YAJL
+    import ast
+    import os
+
+    def signatures(name):
+        path = os.path.join(os.path.dirname(backends.__file__), name + '.py')
+        with open(path) as f:
+            tree = ast.parse(f.read())
+        found = {}
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef) and node.name == 'Parser':
+                for item in node.body:
+                    if isinstance(item, ast.FunctionDef) and item.name == '__init__':
+                        found['Parser'] = [arg.arg for arg in item.args.args]
+            elif isinstance(node, ast.FunctionDef) and not node.name.startswith('_'):
+                found[node.name] = [arg.arg for arg in node.args.args]
+        return found
+
+    python, yajl2 = signatures('python'), signatures('yajl2')
+    assert 'Parser' in yajl2 and 'basic_parse' in yajl2
+    for name in yajl2:
+        assert python[name] == yajl2[name], name
@@ -0,0 +1,122 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import mmap
+
+import pytest
+
+from aiojson import common
+from aiojson.backends.python import MappedParser, basic_parse, items, jsonl, parallel_jsonl
+from aiojson.utils.mappedstream import MappedStreamReader, from_file, from_mmap
+
+from .data import MAP_EVENTS, MAP_JSON
+from .memory import collect
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_mapped_parser_windows():
+    for size in (1, 3, 7, 1000):
+        parser = MappedParser(MAP_JSON)
+        events = []
+        while True:
+            more = parser.advance(size)
+            if more is None:
+                break
+            events.extend(more)
+        assert events + parser.close() == MAP_EVENTS
+
+
+def test_mapped_parser_incomplete():
+    parser = MappedParser(b'{"a": "open')
+    while parser.advance(4) is not None:
+        pass
+    with pytest.raises(common.IncompleteJSONError):
+        parser.close()
+
+
+def test_mapped_parser_not_fed():
+    with pytest.raises(TypeError):
+        MappedParser(b'[]').feed(b'[]')
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_bytes(MAP_JSON)
+    stream = from_file(str(path))
+    assert run(collect(basic_parse(stream, buf_size=5))) == MAP_EVENTS
+    stream.close()
+
+
+def test_from_file_items(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_bytes(MAP_JSON)
+    stream = from_file(str(path))
+    assert run(collect(items(stream, 'docs.item.meta'))) == [[[1], {}], {'key': 'value'}, None]
+    stream.close()
+
+
+def test_from_empty_file(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_bytes(b'')
+    with from_file(str(path)) as stream:
+        assert run(collect(basic_parse(stream))) == []
+
+
+def test_from_mmap_read(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_bytes(MAP_JSON)
+    with open(str(path), 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        stream = from_mmap(mm)
+        chunk = run(stream.read(10))
+        assert isinstance(chunk, memoryview) and bytes(chunk) == MAP_JSON[:10]
+        del chunk
+        stream.close()
+        mm.close()
+
+
+def test_mapped_stream_reader_read():
+    stream = MappedStreamReader(b'[1, 2]')
+    assert bytes(run(stream.read(4))) == b'[1, '
+    assert not stream.at_eof()
+    assert bytes(run(stream.read())) == b'2]'
+    assert stream.at_eof()
+
+
+def test_from_file_close_after_items(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_bytes(MAP_JSON)
+    with from_file(str(path)) as stream:
+        found = items(stream, 'docs.item.meta')
+        assert run(collect(found)) == [[[1], {}], {'key': 'value'}, None]
+    assert stream.owned == ()
+
+
+def test_from_file_close_while_parsing(tmp_path):
+    path = tmp_path / 'map.json'
+    path.write_bytes(MAP_JSON)
+    with from_file(str(path)) as stream:
+        found = items(stream, 'docs.item.meta')
+        assert run(found.next()) == [[1], {}]
+    # the mapping goes once the parser is freed
+    del found
+
+
+JSONL_DATA = b'{"a": 1}\n[2, "\xc3\xa9"]\n\n{"a": {"b": 3.5}}\n'
+
+
+def test_from_file_jsonl(tmp_path):
+    path = tmp_path / 'lines.jsonl'
+    path.write_bytes(JSONL_DATA)
+    with from_file(str(path)) as stream:
+        assert run(collect(jsonl(stream, buf_size=5))) == [{'a': 1}, [2, '\xe9'], {'a': {'b': 3.5}}]
+
+
+def test_from_file_parallel_jsonl(tmp_path):
+    path = tmp_path / 'lines.jsonl'
+    path.write_bytes(JSONL_DATA)
+    with from_file(str(path)) as stream:
+        found = run(collect(parallel_jsonl(stream, buf_size=5, block_size=8, use_float=True)))
+        assert found == [{'a': 1}, [2, '\xe9'], {'a': {'b': 3.5}}]
@@ -0,0 +1,590 @@
+# -*- coding:utf-8 -*-
+import asyncio
+import concurrent.futures
+import json
+
+import pytest
+
+from .. import python
+from ..python import (
+    TokenParser, basic_parse, basic_parse_batches, documents, items, items_multi, jsonl, parallel_jsonl, parse,
+    parse_batches)
+from ... import common
+
+from .data import *
+from .memory import collect, with_memory_reader
+
+NESTED_DEPTH = 200
+NESTED_JSON = '[' * NESTED_DEPTH + '{"a": [1, {}]}' + ']' * NESTED_DEPTH
+NESTED_EVENTS = (
+    [('start_array', None)] * NESTED_DEPTH +
+    [('start_map', None), ('map_key', 'a'), ('start_array', None), ('number', 1),
+     ('start_map', None), ('end_map', None), ('end_array', None), ('end_map', None)] +
+    [('end_array', None)] * NESTED_DEPTH
+)
+
+
+@with_memory_reader(ARRAY_JSON, chunk_size=3)
+async def test_basic_parse_array_chunked(stream):
+    assert await collect(basic_parse(stream)) == ARRAY_EVENTS
+
+
+@with_memory_reader(SIMPLE_MAP_JSON, chunk_size=1)
+async def test_basic_parse_simple_map_chunked(stream):
+    assert await collect(basic_parse(stream)) == SIMPLE_MAP_EVENTS
+
+
+@with_memory_reader(MAP_JSON)
+async def test_basic_parse_map_memory(stream):
+    assert await collect(basic_parse(stream)) == MAP_EVENTS
+
+
+@with_memory_reader(MAP_JSON, chunk_size=1)
+async def test_basic_parse_map_split_utf8(stream):
+    assert await collect(basic_parse(stream, buf_size=1)) == MAP_EVENTS
+
+
+@with_memory_reader(NESTED_JSON, chunk_size=7)
+async def test_basic_parse_deep_nesting(stream):
+    assert await collect(basic_parse(stream)) == NESTED_EVENTS
+
+
+@with_memory_reader(MAP_JSON)
+async def test_parse_map_memory(stream):
+    assert await collect(parse(stream)) == MAP_PREFIXED_EVENTS
+
+
+@with_memory_reader(MAP_JSON)
+async def test_items_map_memory(stream):
+    assert await collect(items(stream, 'docs.item.meta')) == [[[1], {}], {'key': 'value'}, None]
+
+
+@with_memory_reader(NESTED_JSON, chunk_size=16)
+async def test_basic_parse_batches(stream):
+    batches = await collect(basic_parse_batches(stream, buf_size=16))
+    assert all(batches)
+    assert len(batches) > 1
+    assert [event for batch in batches for event in batch] == NESTED_EVENTS
+
+
+@with_memory_reader(SIMPLE_JSON)
+async def test_basic_parse_batches_last_token(stream):
+    # the trailing 'true' is only complete once the stream ends
+    batches = await collect(basic_parse_batches(stream))
+    assert batches == [SIMPLE_EVENTS[:2], SIMPLE_EVENTS[2:]]
+
+
+@with_memory_reader(SIMPLE_MAP_JSON, chunk_size=5)
+async def test_parse_batches(stream):
+    batches = await collect(parse_batches(stream, buf_size=5))
+    assert [event for batch in batches for event in batch] == SIMPLE_MAP_PREFIXED_EVENTS
+
+
+@with_memory_reader(MAP_JSON)
+async def test_items_multi(stream):
+    targets = {'docs.item.meta': 'meta', 'docs.item.integer': 'integer', 'docs.item.meta.item': 'meta item'}
+    assert await collect(items_multi(stream, targets)) == [
+        ('integer', 0),
+        ('meta item', [1]),
+        ('meta item', {}),
+        ('meta', [[1], {}]),
+        ('meta', {'key': 'value'}),
+        ('meta', None),
+    ]
+
+
+@with_memory_reader('[1, 2')
+async def test_basic_parse_incomplete(stream):
+    with pytest.raises(common.IncompleteJSONError):
+        await collect(basic_parse(stream))
+
+
+@with_memory_reader('["abc', chunk_size=2)
+async def test_basic_parse_incomplete_string(stream):
+    with pytest.raises(common.IncompleteJSONError):
+        await collect(basic_parse(stream, buf_size=2))
+
+
+@with_memory_reader('{"a" 1}')
+async def test_basic_parse_unexpected_symbol(stream):
+    with pytest.raises(python.UnexpectedSymbol):
+        await collect(basic_parse(stream))
+
+
+@with_memory_reader(u'[1, é]')
+async def test_basic_parse_unexpected_unicode(stream):
+    with pytest.raises(python.UnexpectedSymbol) as e:
+        await collect(basic_parse(stream))
+    assert u'é' in str(e.value)
+
+
+def test_token_parser_punctuation():
+    parser = TokenParser()
+    events = [parser.token(pos, symbol) for pos, symbol in RAW_TOKENS]
+    parser.close()
+    assert events.count(None) == 11
+    assert [e for e in events if e is not None][:3] == [('start_map', None), ('map_key', 'name'), ('string', 'string')]
+
+
+@with_memory_reader('[1, 1.5, -2e1, 3.0]', chunk_size=2)
+async def test_basic_parse_use_float(stream):
+    events = await collect(basic_parse(stream, use_float=True))
+    values = [value for event, value in events if event == 'number']
+    assert values == [1, 1.5, -20.0, 3.0]
+    assert [type(value) for value in values] == [int, float, float, float]
+
+
+@with_memory_reader('{"a": [1, 2.25]}')
+async def test_items_number_factory(stream):
+    assert await collect(items(stream, 'a.item', number_factory=str)) == ['1', '2.25']
+
+
+@with_memory_reader('{"a": [[1, 2], [3]]}')
+async def test_items_list_factory(stream):
+    assert await collect(items(stream, 'a.item', list_factory=tuple)) == [(1, 2), (3,)]
+
+
+RECORDS_JSON = '{"docs": [{"id": 1, "name": "a\\n", "tags": ["x"], "meta": {"k": [1, 2]}}, {"name": "b", "id": 2}]}'
+
+
+@with_memory_reader(RECORDS_JSON, chunk_size=4)
+async def test_items_into_dataclass(stream):
+    import dataclasses
+
+    @dataclasses.dataclass
+    class Doc:
+        id: int
+        meta: dict = None
+
+    assert await collect(items(stream, 'docs.item', into=Doc)) == [Doc(1, {'k': [1, 2]}), Doc(2)]
+
+
+@with_memory_reader(RECORDS_JSON)
+async def test_items_into_slots(stream):
+    class Doc:
+        __slots__ = ('id', 'name')
+
+        def __init__(self, id, name):
+            self.id = id
+            self.name = name
+
+    docs = await collect(items(stream, 'docs.item', into=Doc))
+    assert [(doc.id, doc.name) for doc in docs] == [(1, 'a\n'), (2, 'b')]
+
+
+@with_memory_reader(RECORDS_JSON)
+async def test_items_into_unprefixed(stream):
+    import collections
+    Doc = collections.namedtuple('Doc', 'id')
+    events = common.parse(basic_parse(stream))
+    assert await collect(common.items(events, 'docs.item', into=Doc)) == [Doc(1), Doc(2)]
+
+
+MIXED_RECORDS_JSON = '{"docs": [{"id": 1, "x": [0]}, [1, {"id": 2}], 3, null, {"id": [4, {"x": 5}]}]}'
+
+
+@with_memory_reader(MIXED_RECORDS_JSON, chunk_size=4)
+async def test_items_into_non_maps(stream):
+    import collections
+    Doc = collections.namedtuple('Doc', 'id')
+    expected = [Doc(1), [1, {'id': 2}], 3, None, Doc([4, {'x': 5}])]
+    assert await collect(items(stream, 'docs.item', into=Doc)) == expected
+    assert python.items_bytes(MIXED_RECORDS_JSON, 'docs.item', into=Doc) == expected
+    assert python.items_bytes(MIXED_RECORDS_JSON, 'docs.item[1:3]', into=Doc) == expected[1:3]
+    events = python.parse_bytes(MIXED_RECORDS_JSON)
+    assert common.items_events(events, 'docs.item', into=Doc) == expected
+
+
+DOCUMENTS_JSON = '{"a": [1, {"b": 2}]}\n"text" [3]\n\n{"a": []}\n'
+
+
+@with_memory_reader(DOCUMENTS_JSON, chunk_size=3)
+async def test_documents(stream):
+    assert await collect(documents(stream)) == [{'a': [1, {'b': 2}]}, 'text', [3], {'a': []}]
+
+
+@with_memory_reader(DOCUMENTS_JSON, chunk_size=3)
+async def test_documents_prefix(stream):
+    assert await collect(documents(stream, 'a.item')) == [[1, {'b': 2}], [], [], []]
+
+
+@with_memory_reader(DOCUMENTS_JSON, chunk_size=3)
+async def test_async_for_events(stream):
+    events = []
+    async for prefix, event, value in parse(stream):
+        events.append(event)
+    assert events.count('start_map') == 3
+
+
+EMPTY_KEYS_JSON = '{"": {"": [1]}, "a": 2} 5 {"a": {"": 1}}'
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    (None, [{'': {'': [1]}, 'a': 2}, 5, {'a': {'': 1}}]),
+    ('a', [[2], [], [{'': 1}]]),
+    ('', [[{'': {'': [1]}, 'a': 2}], [5], [{'a': {'': 1}}]]),
+    ('*', [[{'': [1]}, 2], [], [{'': 1}]]),
+])
+def test_documents_empty_keys(prefix, expected):
+    @with_memory_reader(EMPTY_KEYS_JSON, chunk_size=4)
+    async def check(stream):
+        assert await collect(documents(stream, prefix)) == expected
+    check()
+
+
+@with_memory_reader(EMPTY_KEYS_JSON, chunk_size=4)
+async def test_items_empty_key_prefix(stream):
+    assert await collect(items(stream, '')) == [{'': {'': [1]}, 'a': 2}, 5, {'a': {'': 1}}]
+
+
+@with_memory_reader(b'{"a": [1, {"b": 2}]}\n"text"\n\n[3]\n', chunk_size=3)
+async def test_jsonl(stream):
+    assert await collect(jsonl(stream, buf_size=3)) == [{'a': [1, {'b': 2}]}, 'text', [3]]
+
+
+@with_memory_reader(b'{"a": 1.5, "b": [1.0, 2e1]}\n\n["\\u0441", 3]', chunk_size=4)
+async def test_jsonl_numbers(stream):
+    assert await collect(jsonl(stream)) == [{'a': common.number('1.5'), 'b': [1, 20]}, ['с', 3]]
+
+
+@with_memory_reader('{"a": [1, 2]}\n{"b": 3}\n{"a": {"item": 4}}', chunk_size=5)
+async def test_jsonl_prefix(stream):
+    assert await collect(jsonl(stream, prefix='a.item', use_float=True)) == [[1, 2], [], [4]]
+
+
+@with_memory_reader('{"a": 1}\n{"a": \n')
+async def test_jsonl_invalid(stream):
+    with pytest.raises(common.JSONError) as error:
+        await collect(jsonl(stream))
+    assert 'Line 2' in str(error.value)
+
+
+@pytest.mark.parametrize('constant', ['NaN', 'Infinity', '-Infinity'])
+def test_jsonl_constants(constant):
+    data = '[1]\n[%s]\n' % constant
+
+    @with_memory_reader(data)
+    async def check(stream):
+        with pytest.raises(common.JSONError) as error:
+            await collect(jsonl(stream))
+        assert 'Line 2' in str(error.value)
+    check()
+    with pytest.raises(common.JSONError):
+        common.decode_lines(data)
+
+
+PARALLEL_JSONL = ''.join('{"id": %d, "tags": [%d, "x"]}\n' % (i, i) for i in range(200))
+
+
+@with_memory_reader(PARALLEL_JSONL.encode('utf-8'), chunk_size=100)
+async def test_parallel_jsonl_ordered(stream):
+    values = await collect(parallel_jsonl(stream, buf_size=64, block_size=300, max_pending=3))
+    assert values == [{'id': i, 'tags': [i, 'x']} for i in range(200)]
+
+
+LONG_LINES_JSONL = ''.join('{"id": %d, "text": "%s"}\n' % (i, 'x' * (i * 37 % 150)) for i in range(60))
+
+
+@pytest.mark.parametrize('chunk_size, block_size', [(7, 50), (64, 100), (500, 20), (3, 1000)])
+def test_parallel_jsonl_block_cuts(chunk_size, block_size):
+    @with_memory_reader(LONG_LINES_JSONL.encode('utf-8'), chunk_size=chunk_size)
+    async def check(stream):
+        values = await collect(parallel_jsonl(stream, buf_size=chunk_size, block_size=block_size, max_pending=2))
+        assert values == [json.loads(line) for line in LONG_LINES_JSONL.splitlines()]
+    check()
+
+
+@with_memory_reader(PARALLEL_JSONL, chunk_size=100)
+async def test_parallel_jsonl_unordered(stream):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(4) as executor:
+        values = await collect(parallel_jsonl(stream, executor, 'tags.item', block_size=500, ordered=False))
+    assert sorted(value for value in values if value != 'x') == list(range(200))
+    assert values.count('x') == 200
+
+
+@with_memory_reader('{"a": [1, 2]}\n{"b": 3}\n{"a": {"item": 4}}\n', chunk_size=5)
+async def test_parallel_jsonl_prefix(stream):
+    assert await collect(parallel_jsonl(stream, prefix='a.item', block_size=8)) == [1, 2, 4]
+
+
+class StalledExecutor(concurrent.futures.Executor):
+    '''
+    Runs the first call it's given, and leaves the others pending.
+    '''
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, func, *args):
+        future = concurrent.futures.Future()
+        if not self.futures:
+            future.set_result(func(*args))
+        self.futures.append(future)
+        return future
+
+
+@with_memory_reader(PARALLEL_JSONL, chunk_size=100)
+async def test_parallel_jsonl_aclose(stream):
+    executor = StalledExecutor()
+    values = parallel_jsonl(stream, executor, block_size=100, max_pending=4)
+    assert await values.next() == {'id': 0, 'tags': [0, 'x']}
+    await values.aclose()
+    with pytest.raises(StopAsyncIteration):
+        await values.next()
+    # the cancellation reaches the executor's futures from the loop
+    await asyncio.sleep(0)
+    assert len(executor.futures) == 4
+    assert all(future.cancelled() for future in executor.futures[1:])
+
+
+@with_memory_reader(b'1\n2\n\n3\n[4,\n5\n', chunk_size=2)
+async def test_parallel_jsonl_invalid(stream):
+    with pytest.raises(common.JSONError) as error:
+        await collect(parallel_jsonl(stream, block_size=4))
+    assert 'Line 5' in str(error.value)
+
+
+class PacketStreamReader:
+    """
+    Serves its packets one per read like aiohttp's StreamReader, which it
+    mimics by keeping them in a deque as _buffer.
+    """
+
+    def __init__(self, packets):
+        import collections
+        self._buffer = collections.deque(packets)
+
+    async def read(self, n=-1):
+        if not self._buffer:
+            return b''
+        packet = self._buffer.popleft()
+        if 0 <= n < len(packet):
+            self._buffer.appendleft(packet[n:])
+            packet = packet[:n]
+        return packet
+
+
+@with_memory_reader(MAP_JSON)
+async def test_adaptive_read_size_grows(stream):
+    sizes = []
+    buf_size = common.AdaptiveReadSize(min_size=16, max_size=128, hook=lambda size, received: sizes.append(size))
+    assert await collect(basic_parse(stream, buf_size=buf_size)) == MAP_EVENTS
+    assert sizes[:5] == [16, 32, 64, 128, 128]
+    assert buf_size.snapshot()['bytes'] == len(MAP_JSON)
+
+
+def test_adaptive_read_size_coalesces():
+    import asyncio
+    packets = [MAP_JSON[i:i + 10] for i in range(0, len(MAP_JSON), 10)]
+    stream = PacketStreamReader(packets)
+    buf_size = common.AdaptiveReadSize(min_size=64, max_size=1024)
+    events = asyncio.get_event_loop().run_until_complete(collect(basic_parse(stream, buf_size=buf_size)))
+    assert events == MAP_EVENTS
+    stats = buf_size.snapshot()
+    assert stats['coalesced'] > 0
+    assert stats['reads'] < len(packets)
+    assert stats['largest'] >= 64
+
+
+@with_memory_reader(MAP_JSON, chunk_size=16)
+async def test_parse_stats(stream):
+    snapshots = []
+    stats = common.ParseStats(callback=snapshots.append)
+    assert await collect(basic_parse(stream, buf_size=16, stats=stats)) == MAP_EVENTS
+    snapshot = stats.snapshot()
+    assert snapshot['bytes_read'] == len(MAP_JSON)
+    assert snapshot['reads'] == len(MAP_JSON) // 16 + 2
+    assert snapshot['events'] == len(MAP_EVENTS)
+    assert snapshot['tokens'] > snapshot['events']
+    assert snapshot['max_depth'] == 5
+    assert 0 < snapshot['peak_buffer'] <= 64
+    assert snapshots[-1] == snapshot and len(snapshots) == snapshot['reads']
+
+
+@with_memory_reader(MAP_JSON)
+async def test_items_stats(stream):
+    stats = common.ParseStats()
+    assert len(await collect(items(stream, 'docs.item', stats=stats))) == 4
+    assert stats.build_time > 0 and stats.parse_time > 0
+    assert stats.events == len(MAP_EVENTS)
+
+
+@with_memory_reader(RAW_DATA, chunk_size=8)
+async def test_basic_parse_token_stats(stream):
+    stats = common.ParseStats()
+    await collect(basic_parse(stream, 8, stats=stats))
+    assert stats.tokens == len(RAW_TOKENS)
+    assert stats.bytes_read == len(RAW_DATA.encode('utf-8'))
+
+
+@with_memory_reader(RAW_DATA, chunk_size=8)
+async def test_lexer_stats(stream):
+    stats = common.ParseStats()
+    assert len(await collect(python.Lexer(stream, 8, stats))) == len(RAW_TOKENS)
+    assert stats.tokens == len(RAW_TOKENS)
+    assert stats.bytes_read == len(RAW_DATA.encode('utf-8'))
+
+
+def test_items_bytes_async():
+    import asyncio
+    values = python.items_bytes_async(MAP_JSON, 'docs.item.meta')
+    result = asyncio.get_event_loop().run_until_complete(collect(values))
+    assert result == [[[1], {}], {'key': 'value'}, None]
+
+
+def test_async_for_bytes():
+    import asyncio
+
+    async def consume():
+        found = [obj async for obj in python.items_bytes_async(MAP_JSON, 'docs.item.meta')]
+        found.append([event async for event in python.basic_parse_bytes_async(ARRAY_JSON)])
+        return found
+    found = asyncio.get_event_loop().run_until_complete(consume())
+    assert found == [[[1], {}], {'key': 'value'}, None, ARRAY_EVENTS]
+
+
+SELECT_JSON = '{"earth": {"europe": [{"id": 1}, {"id": 2}], "america": [{"id": 3, "sub": {"id": 4}}]}, "id": 5}'
+
+
+@with_memory_reader(SELECT_JSON, chunk_size=5)
+async def test_items_wildcard(stream):
+    assert await collect(items(stream, 'earth.*.item')) == [{'id': 1}, {'id': 2}, {'id': 3, 'sub': {'id': 4}}]
+
+
+@with_memory_reader(SELECT_JSON, chunk_size=5)
+async def test_items_deep_wildcard(stream):
+    assert await collect(items(stream, '**.id')) == [1, 2, 3, 4, 5]
+
+
+@with_memory_reader(SELECT_JSON)
+async def test_items_deep_wildcard_outermost(stream):
+    found = await collect(items(stream, '**.america.**'))
+    assert found == [[{'id': 3, 'sub': {'id': 4}}]]
+
+
+@with_memory_reader(MAP_JSON)
+async def test_items_slice(stream):
+    assert await collect(items(stream, 'docs.item[1:3].meta')) == [[[1], {}], {'key': 'value'}]
+
+
+@with_memory_reader(MAP_JSON)
+async def test_select_items_unskipped(stream):
+    events = basic_parse(stream)
+    assert await collect(common.select_items(events, 'docs.item[2].meta')) == [{'key': 'value'}]
+
+
+@with_memory_reader(SELECT_JSON, chunk_size=5)
+async def test_async_for(stream):
+    ids = [id async for id in items(stream, '**.id')]
+    assert ids == [1, 2, 3, 4, 5]
+
+
+@with_memory_reader('{"docs": [' + ', '.join(['{"n": %d}' % i for i in range(1000)]) + '], "end": 1}', chunk_size=64)
+async def test_items_slice_stops_reading(stream):
+    assert await collect(items(stream, 'docs.item[0:3].n', stop_after_prefix_closed=True)) == [0, 1, 2]
+    assert not stream.at_eof() and stream.pos < 256
+
+
+@with_memory_reader('{"meta": {"n": 1}, "docs": [' + ', '.join(['%d' % i for i in range(1000)]) + ']}', chunk_size=64)
+async def test_items_key_stops_reading(stream):
+    events = basic_parse(stream)
+    found = common.select_items(events, common.Selector('meta.*'), stop_after_prefix_closed=True)
+    assert await collect(found) == [1]
+    assert stream.pos < 256
+
+
+@with_memory_reader(b'{"a": [1, 2], "b": 0} {"a": [3]} [] {"a": [4, 5, 6]}', chunk_size=4)
+async def test_items_slice_documents(stream):
+    assert await collect(items(stream, 'a.item[0:2]')) == [1, 2, 3, 4, 5]
+
+
+@with_memory_reader('{"docs": [' + ', '.join(['{"n": %d}' % i for i in range(1000)]) + ']}', chunk_size=64)
+async def test_items_slice_reads_to_end(stream):
+    assert await collect(items(stream, 'docs.item[0:3].n')) == [0, 1, 2]
+    assert stream.at_eof()
+
+
+HEAD_JSON = ('{"earth": {"europe": [{"id": 1}, {"id": 2}], "america": [' +
+             ', '.join(['{"id": %d}' % i for i in range(1000)]) + ']}, "id": 0}')
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_limit(stream):
+    assert await collect(items(stream, 'earth.america.item.id', limit=3)) == [0, 1, 2]
+    assert stream.pos < 256
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_stop_after_prefix_closed(stream):
+    found = await collect(items(stream, 'earth.europe.item', stop_after_prefix_closed=True))
+    assert found == [{'id': 1}, {'id': 2}]
+    assert stream.pos < 256
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_stop_after_prefix_closed_unbounded(stream):
+    assert len(await collect(items(stream, 'earth.america.item', stop_after_prefix_closed=True))) == 1000
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_stop_after_single_prefix(stream):
+    assert await collect(items(stream, 'earth.europe', stop_after_prefix_closed=True)) == [[{'id': 1}, {'id': 2}]]
+    assert stream.pos < 256
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_close_stream(stream):
+    closed = []
+    found = items(stream, 'earth.europe.item.id', limit=1, close_stream=lambda: closed.append(True))
+    assert await found.next() == 1
+    assert closed == [True]
+    assert await collect(found) == []
+    assert closed == [True]
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_items_close_stream_pattern(stream):
+    closed = []
+
+    async def close():
+        closed.append(True)
+    found = items(stream, 'earth.america.item[0:2].id', stop_after_prefix_closed=True, close_stream=close)
+    assert await collect(found) == [0, 1]
+    assert closed == [True] and stream.pos < 256
+
+
+@with_memory_reader(HEAD_JSON, chunk_size=64)
+async def test_lexer_aclose(stream):
+    lexer = python.Lexer(stream, 64)
+    assert (await lexer.next())[1] == '{'
+    await lexer.aclose()
+    assert await collect(lexer) == []
+    assert stream.pos == 64
+
+
+def test_items_bytes_patterns():
+    assert python.items_bytes(SELECT_JSON, '**.id') == [1, 2, 3, 4, 5]
+    assert python.items_bytes(SELECT_JSON, 'earth.america.item[0].sub') == [{'id': 4}]
+    assert python.items_bytes(b'{"a":[1,2]} {"a":[3]}', 'a.item[0:5]') == [1, 2, 3]
+
+
+@with_memory_reader(SELECT_JSON)
+async def test_common_items_pattern(stream):
+    events = common.parse(basic_parse(stream))
+    assert await collect(common.items(events, 'earth.*.item[1]')) == [{'id': 2}]
+
+
+@with_memory_reader(b'{"a": [1, 2]} {"b": {"c": 0}, "a": [[3]]} {"a": [4]}', chunk_size=5)
+async def test_common_items_pattern_documents(stream):
+    events = common.parse(basic_parse(stream))
+    assert await collect(common.items(events, 'a.item[0]')) == [1, [3], 4]
+
+
+@with_memory_reader(DOCUMENTS_JSON, chunk_size=3)
+async def test_documents_pattern(stream):
+    assert await collect(documents(stream, '*.item[1]')) == [[{'b': 2}], [], [], []]
+
+
+@with_memory_reader(b'{"a": {"x": 1}}\n{"b": {"x": 2}}\n', chunk_size=3)
+async def test_jsonl_pattern(stream):
+    assert await collect(jsonl(stream, '*.x')) == [[1], [2]]
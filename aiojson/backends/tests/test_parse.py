@@ -1,7 +1,13 @@
 # -*- coding:utf-8 -*-
-from aiojson.backends.python import Buffer, get_tokens
+import pytest
 
-from .data import RAW_DATA, RAW_TOKENS
+from aiojson import common
+from aiojson.backends.python import (
+    Buffer, BytesBuffer, Parser, basic_parse_bytes, get_tokens, items_bytes, parse_bytes, unescape, unescape_key,
+    unescape_string)
+
+from .data import (
+    MAP_EVENTS, MAP_JSON, MAP_PREFIXED_EVENTS, RAW_DATA, RAW_TOKENS, SIMPLE_EVENTS, SIMPLE_JSON)
 
 
 def test_get_tokens_all():
@@ -30,14 +36,171 @@ def test_get_tokens_chunks_split_in_number():
     validate_get_tokens_reentrant(Buffer(chunk1), Buffer(chunk2))
 
 
-def validate_get_tokens_reentrant(*buffers):
+def test_get_tokens_bytes():
+    buf = BytesBuffer(RAW_DATA.encode('utf-8'))
+    tokens = list(get_tokens(buf, more_data=False))
+    assert tokens == RAW_TOKENS
+    assert all(isinstance(token, str) for pos, token in tokens)
+
+
+def test_get_tokens_bytes_memoryview():
+    buf = BytesBuffer(memoryview(RAW_DATA.encode('utf-8')))
+    assert list(get_tokens(buf, more_data=False)) == RAW_TOKENS
+
+
+def test_get_tokens_bytes_split_utf8():
+    data = u'["d\u00e9j\u00e0", "\\\"", "строка"]'.encode('utf-8')
+    expected = list(get_tokens(Buffer(data.decode('utf-8')), more_data=False))
+    expected = [token for pos, token in expected]
+    for cut in range(1, len(data)):
+        buffer = BytesBuffer(data[:cut])
+        tokens = list(get_tokens(buffer))
+        buffer = buffer + BytesBuffer(data[cut:])
+        tokens += list(get_tokens(buffer, more_data=False))
+        assert [token for pos, token in tokens] == expected
+
+
+def test_get_tokens_compacts_consumed_data():
+    for buffer_class, data in ((Buffer, RAW_DATA), (BytesBuffer, RAW_DATA.encode('utf-8'))):
+        chunks = [buffer_class(data[i:i + 3]) for i in range(0, len(data), 3)]
+        validate_get_tokens_reentrant(*chunks, max_size=len('"weight"') + 3)
+
+
+def test_get_tokens_string_resumed_across_chunks():
+    data = u'["a\\\\", "\\\\\\"b\\\\", "строка \\"q\\"", 1]'
+    expected = [token for pos, token in get_tokens(Buffer(data), more_data=False)]
+    assert len(expected) == 9
+    for buffer_class, raw in ((Buffer, data), (BytesBuffer, data.encode('utf-8'))):
+        for size in (1, 2, 3, 5):
+            buffer = buffer_class(raw[:0])
+            tokens = []
+            for i in range(0, len(raw), size):
+                buffer = buffer + buffer_class(raw[i:i + size])
+                tokens += list(get_tokens(buffer))
+            tokens += list(get_tokens(buffer, more_data=False))
+            assert [token for pos, token in tokens] == expected
+            assert tokens[-1] == (len(raw) - 1, u']')
+
+
+def test_parser_feed_bytes():
+    parser = Parser()
+    events = []
+    for i in range(len(MAP_JSON)):
+        events += parser.feed(MAP_JSON[i:i + 1])
+    events += parser.close()
+    assert events == MAP_EVENTS
+
+
+def test_parser_feed_leaves_input_unchanged():
+    parser = Parser()
+    first, second = bytearray(b'[10, 2'), bytearray(b'0, 3')
+    assert parser.feed(first) == [('start_array', None), ('number', 10)]
+    assert parser.feed(second) == [('number', 20)]
+    assert parser.feed(b']') + parser.close() == [('number', 3), ('end_array', None)]
+    assert first == bytearray(b'[10, 2') and second == bytearray(b'0, 3')
+
+
+def test_parser_feed_str():
+    parser = Parser()
+    assert parser.feed(SIMPLE_JSON[:10]) == SIMPLE_EVENTS[:1]
+    assert parser.feed(SIMPLE_JSON[10:]) == SIMPLE_EVENTS[1:2]
+    assert parser.close() == SIMPLE_EVENTS[2:]
+
+
+def test_parser_close_incomplete():
+    parser = Parser()
+    parser.feed(b'{"key": "val')
+    with pytest.raises(common.IncompleteJSONError):
+        parser.close()
+    parser = Parser()
+    parser.feed(b'{"key": "value"')
+    with pytest.raises(common.IncompleteJSONError):
+        parser.close()
+
+
+SKIP_JSON = u'{"skip": ["a\\"]{", {"x": [1, tru]}, 1.5], "keep": {"v": "\\u0041"}, "n": 4}'
+SKIP_EVENTS = [('start_map', None), ('map_key', 'skip'), ('map_key', 'keep'), ('start_map', None),
+               ('map_key', 'v'), ('string', 'A'), ('end_map', None), ('map_key', 'n'), ('end_map', None)]
+
+
+def test_parser_prefixes_skip_values():
+    for data in (SKIP_JSON, SKIP_JSON.encode('utf-8')):
+        for size in (1, 4, len(data)):
+            parser = Parser(prefixes=['keep'])
+            events = []
+            for i in range(0, len(data), size):
+                events += parser.feed(data[i:i + size])
+            events += parser.close()
+            assert events == SKIP_EVENTS
+
+
+def test_parser_prefixes_map():
+    parser = Parser(prefixes=['docs.item.meta'])
+    events = parser.feed(MAP_JSON) + parser.close()
+    # the values of the first doc are all skipped, only its keys are left
+    first_doc_end = MAP_EVENTS.index(('end_map', None))
+    first_doc = [e for e in MAP_EVENTS[4:first_doc_end] if e[0] == 'map_key']
+    assert events == MAP_EVENTS[:4] + first_doc + MAP_EVENTS[first_doc_end:]
+
+
+def test_parser_prefixes_incomplete():
+    parser = Parser(prefixes=['keep'])
+    parser.feed(b'{"skip": [1, {"a": "]"')
+    with pytest.raises(common.IncompleteJSONError):
+        parser.close()
+
+
+def validate_get_tokens_reentrant(*buffers, max_size=None):
     tokens = []
-    buffer = Buffer('')
+    buffer = type(buffers[0])(buffers[0].buf[:0])
     for b in buffers:
         buffer = buffer + b
+        if max_size is not None:
+            assert len(buffer) <= max_size
         tokens += list(get_tokens(buffer))
     tokens += list(get_tokens(buffer, False))
     unfinished = buffer.search()
     assert not unfinished
     assert len(tokens) == len(RAW_TOKENS)
     assert tokens == RAW_TOKENS
+
+
+def test_unescape():
+    assert unescape(r'a\nb\t\"c\\d\/e') == 'a\nb\t"c\\d/e'
+    assert unescape(r'é😀') == '\xe9\U0001f600'
+    assert unescape(r'\ud83d') == '\ud83d'
+    assert unescape(r'\x') == 'x'
+
+
+def test_unescape_string():
+    assert unescape_string(r'"plain"') == 'plain'
+    assert unescape_string(r'"😀 \"x\""') == '\U0001f600 "x"'
+    assert unescape_string(r'"bad \x"') == 'bad x'
+
+
+def test_unescape_key_shared():
+    parser = Parser()
+    events = parser.feed('[{"k\\u00e9y": 1}, {"k\\u00e9y": 2}]') + parser.close()
+    keys = [value for event, value in events if event == 'map_key']
+    assert keys == ['k\xe9y', 'k\xe9y']
+    assert keys[0] is keys[1]
+    assert unescape_key('"k\\u00e9y"') is keys[0]
+
+
+def test_basic_parse_bytes():
+    assert basic_parse_bytes(MAP_JSON) == MAP_EVENTS
+    assert basic_parse_bytes(SIMPLE_JSON) == SIMPLE_EVENTS
+
+
+def test_basic_parse_bytes_incomplete():
+    with pytest.raises(common.IncompleteJSONError):
+        basic_parse_bytes(b'{"a": [1')
+
+
+def test_parse_bytes():
+    assert parse_bytes(MAP_JSON) == MAP_PREFIXED_EVENTS
+
+
+def test_items_bytes():
+    assert items_bytes(MAP_JSON, 'docs.item.meta') == [[[1], {}], {'key': 'value'}, None]
+    assert items_bytes('[1, [2], {"a": 3}]', 'item', list_factory=tuple) == [1, (2,), {'a': 3}]
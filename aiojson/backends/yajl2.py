@@ -0,0 +1,308 @@
+'''
+Wrapper for the YAJL C library version 2.x, through ctypes.
+
+YAJL is a push parser, so each chunk read from the stream is handed to it
+whole and the tokenizing happens in C, calling back into python only once
+per event.
+'''
+import decimal
+from ctypes import Structure, CFUNCTYPE, byref, c_double, c_int, c_longlong, c_size_t, c_void_p, string_at
+
+from .. import common
+from . import find_yajl
+
+BUFSIZE = 16 * 1024
+
+yajl = find_yajl(2)
+yajl.yajl_alloc.restype = c_void_p
+yajl.yajl_alloc.argtypes = [c_void_p, c_void_p, c_void_p]
+yajl.yajl_free.argtypes = [c_void_p]
+yajl.yajl_parse.argtypes = [c_void_p, c_void_p, c_size_t]
+yajl.yajl_complete_parse.argtypes = [c_void_p]
+yajl.yajl_get_error.restype = c_void_p
+yajl.yajl_get_error.argtypes = [c_void_p, c_int, c_void_p, c_size_t]
+yajl.yajl_free_error.argtypes = [c_void_p, c_void_p]
+
+# results of yajl_parse, from yajl_parse.h
+YAJL_OK = 0
+YAJL_CANCELLED = 1
+YAJL_ERROR = 2
+
+# options of yajl_config, from yajl_parse.h
+YAJL_MULTIPLE_VALUES = 0x08
+
+C_EMPTY = CFUNCTYPE(c_int, c_void_p)
+C_INT = CFUNCTYPE(c_int, c_void_p, c_int)
+C_LONGLONG = CFUNCTYPE(c_int, c_void_p, c_longlong)
+C_DOUBLE = CFUNCTYPE(c_int, c_void_p, c_double)
+# strings aren't NUL terminated, so take a plain pointer and read the length
+C_STR = CFUNCTYPE(c_int, c_void_p, c_void_p, c_size_t)
+
+
+def _string(value, length):
+    if not length:
+        return ''
+    return string_at(value, length).decode('utf-8')
+
+
+# The fields of yajl_callbacks in order, with the event each one produces and
+# how to convert its value.  integer and double are left NULL, so YAJL hands
+# us all numbers as text and they are converted like in the python backend,
+# number's converter is set per Parser.
+_callback_data = [
+    ('null', 'null', C_EMPTY, lambda: None),
+    ('boolean', 'boolean', C_INT, lambda value: bool(value)),
+    ('integer', None, C_LONGLONG, None),
+    ('double', None, C_DOUBLE, None),
+    ('number', 'number', C_STR, None),
+    ('string', 'string', C_STR, _string),
+    ('start_map', 'start_map', C_EMPTY, lambda: None),
+    ('map_key', 'map_key', C_STR, _string),
+    ('end_map', 'end_map', C_EMPTY, lambda: None),
+    ('start_array', 'start_array', C_EMPTY, lambda: None),
+    ('end_array', 'end_array', C_EMPTY, lambda: None),
+]
+
+
+class Callbacks(Structure):
+    _fields_ = [(name, func_type) for name, event, func_type, func in _callback_data]
+
+
+class YajlError(common.JSONError):
+    pass
+
+
+class Parser(object):
+    '''
+    Push parser around a YAJL handle, with the same interface as
+    python.Parser.  Each chunk of input passed to `feed` returns the list of
+    events it completed; `close` flushes the last token and checks the input
+    was complete.  Numbers are converted as set by use_float and
+    number_factory, see common.get_number_factory.
+
+    prefixes is accepted for the same signature as python.Parser, and
+    ignored: YAJL can't skip parts of the document, all events are produced.
+    '''
+    def __init__(self, prefixes=None, use_float=False, number_factory=None):
+        self.events = []
+        # exceptions raised by callbacks, which can't propagate through YAJL
+        self.errors = []
+        self.started = False
+        number = common.get_number_factory(use_float, number_factory)
+        callbacks = {}
+        for name, event, func_type, func in _callback_data:
+            if name == 'number':
+                func = self._number(number)
+            if event is not None:
+                callbacks[name] = func_type(self._callback(event, func))
+        self.callbacks = Callbacks(**callbacks)
+        self.handle = c_void_p(yajl.yajl_alloc(byref(self.callbacks), None, None))
+        # parse concatenated values like the python backend does
+        yajl.yajl_config(self.handle, c_int(YAJL_MULTIPLE_VALUES), c_int(1))
+
+    def _number(self, number):
+        def convert(value, length):
+            symbol = string_at(value, length).decode('ascii')
+            try:
+                return number(symbol)
+            except (decimal.InvalidOperation, ValueError):
+                raise YajlError('Unexpected symbol %r' % symbol)
+        return convert
+
+    def _callback(self, event, func):
+        append = self.events.append
+        errors = self.errors
+
+        def callback(context, *args):
+            try:
+                append((event, func(*args)))
+            except Exception as e:
+                # returning 0 cancels the parse, the error is raised by _check
+                errors.append(e)
+                return 0
+            return 1
+        return callback
+
+    def feed(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        elif not isinstance(data, bytes):
+            data = bytes(data)
+        if not self.started:
+            # YAJL errors on input with no value at all, the python backend doesn't
+            self.started = not data.isspace() and len(data) > 0
+        self._check(yajl.yajl_parse(self.handle, data, len(data)), data)
+        return self._take_events()
+
+    def close(self):
+        if self.started:
+            self._check(yajl.yajl_complete_parse(self.handle), b'')
+        return self._take_events()
+
+    def _take_events(self):
+        events = self.events[:]
+        del self.events[:]
+        return events
+
+    def _check(self, result, data):
+        if result == YAJL_CANCELLED and self.errors:
+            error = self.errors.pop()
+            del self.errors[:]
+            raise error
+        if result != YAJL_OK:
+            # verbose errors quote the input around the error, if we have it
+            error = yajl.yajl_get_error(self.handle, 1 if data else 0, data, len(data))
+            message = string_at(error).decode('utf-8', 'replace')
+            yajl.yajl_free_error(self.handle, error)
+            if not data:
+                raise common.IncompleteJSONError(message)
+            raise YajlError(message)
+
+    def __del__(self):
+        if getattr(self, 'handle', None):
+            yajl.yajl_free(self.handle)
+
+
+def basic_parse_batches(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None,
+                        stats=None):
+    '''
+    Iterator yielding lists of unprefixed events, one list with all the events
+    completed by each chunk read from the stream.
+
+    Parameters:
+
+    - stream: an asyncio stream with JSON input
+    - buf_size: bytes per read, or a common.AdaptiveReadSize
+    - prefixes: ignored, as by Parser
+    - use_float: convert numbers with a fraction or exponent to float, not Decimal
+    - number_factory: function converting the text of each number
+    - stats: a common.ParseStats to measure the parse into
+    '''
+    return common.read_batches(stream, Parser(prefixes, use_float, number_factory), buf_size, stats)
+
+
+def basic_parse(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None, stats=None):
+    '''
+    Iterator yielding unprefixed events.
+
+    Parameters:
+
+    - stream: an asyncio stream with JSON input
+    - prefixes: ignored, as by Parser
+    - use_float: convert numbers with a fraction or exponent to float, not Decimal
+    - number_factory: function converting the text of each number
+    - stats: a common.ParseStats to measure the parse into
+    '''
+    return common.unbatch(basic_parse_batches(stream, buf_size, prefixes, use_float, number_factory, stats))
+
+
+def parse(stream, buf_size=BUFSIZE, prefixes=None, use_float=False, number_factory=None, stats=None):
+    '''
+    Backend-specific wrapper for common.parse.
+    '''
+    return common.parse(basic_parse(stream, buf_size, prefixes, use_float, number_factory, stats))
+
+
+def parse_batches(stream, buf_size=BUFSIZE, use_float=False, number_factory=None, stats=None):
+    '''
+    Backend-specific wrapper for common.parse_batches.
+    '''
+    return common.parse_batches(basic_parse_batches(stream, buf_size, None, use_float, number_factory, stats))
+
+
+def items(stream, prefix, use_float=False, number_factory=None, dict_factory=None, list_factory=None,
+          into=None, stats=None, limit=None, stop_after_prefix_closed=False, close_stream=False):
+    '''
+    Backend-specific wrapper for common.items, or common.select_items if
+    the prefix is a pattern for, or a, common.Selector.
+    '''
+    if common.is_pattern(prefix):
+        events = basic_parse(stream, use_float=use_float, number_factory=number_factory, stats=stats)
+        return common.select_items(events, prefix, dict_factory, list_factory, into, stats, limit,
+                                   stop_after_prefix_closed, close_stream)
+    events = parse(stream, use_float=use_float, number_factory=number_factory, stats=stats)
+    return common.items(events, prefix, dict_factory, list_factory, into, stats,
+                        limit, stop_after_prefix_closed, close_stream)
+
+
+def items_multi(stream, targets, use_float=False, number_factory=None, dict_factory=None, list_factory=None):
+    '''
+    Backend-specific wrapper for common.items_multi.
+    '''
+    events = parse(stream, use_float=use_float, number_factory=number_factory)
+    return common.items_multi(events, targets, dict_factory, list_factory)
+
+
+def documents(stream, prefix=None, buf_size=BUFSIZE, use_float=False, number_factory=None,
+              dict_factory=None, list_factory=None):
+    '''
+    Backend-specific wrapper for common.documents.
+    '''
+    events = parse(stream, buf_size, use_float=use_float, number_factory=number_factory)
+    return common.documents(events, prefix, dict_factory, list_factory)
+
+
+def jsonl(stream, prefix=None, buf_size=BUFSIZE, use_float=False, number_factory=None):
+    '''
+    Wrapper for common.jsonl, the fast path for newline delimited JSON,
+    which doesn't depend on the backend.
+    '''
+    return common.jsonl(stream, buf_size, prefix, use_float, number_factory)
+
+
+def parallel_jsonl(stream, executor=None, prefix=None, buf_size=BUFSIZE, block_size=1024 * 1024,
+                   use_float=False, number_factory=None, ordered=True, max_pending=None):
+    '''
+    Wrapper for common.parallel_jsonl, which doesn't depend on the backend.
+    '''
+    return common.parallel_jsonl(stream, executor, buf_size, block_size, prefix,
+                                 use_float, number_factory, ordered, max_pending)
+
+
+def basic_parse_bytes(data, prefixes=None, use_float=False, number_factory=None):
+    '''
+    Returns the list of unprefixed events of a document already in memory,
+    str or utf-8 bytes, parsed synchronously: no stream, no awaits.
+    prefixes is ignored, as by Parser.
+    '''
+    parser = Parser(prefixes, use_float, number_factory)
+    return parser.feed(data) + parser.close()
+
+
+def parse_bytes(data, prefixes=None, use_float=False, number_factory=None):
+    '''
+    Synchronous parse of a document already in memory, returning a list.
+    '''
+    return common.parse_events(basic_parse_bytes(data, prefixes, use_float, number_factory))
+
+
+def items_bytes(data, prefix, use_float=False, number_factory=None, dict_factory=None, list_factory=None,
+                into=None):
+    '''
+    Synchronous items of a document already in memory, returning a list.
+    The prefix can be a pattern, as for items.
+    '''
+    events = parse_bytes(data, use_float=use_float, number_factory=number_factory)
+    return common.items_events(events, prefix, dict_factory, list_factory, into)
+
+
+def basic_parse_bytes_async(data, *args, **kwargs):
+    '''
+    basic_parse_bytes as an iterator like basic_parse's, for code written
+    against streams.  The document is parsed at once, before returning.
+    '''
+    return common.values(basic_parse_bytes(data, *args, **kwargs))
+
+
+def parse_bytes_async(data, *args, **kwargs):
+    '''
+    parse_bytes as an iterator like parse's.
+    '''
+    return common.values(parse_bytes(data, *args, **kwargs))
+
+
+def items_bytes_async(data, prefix, *args, **kwargs):
+    '''
+    items_bytes as an iterator like items'.
+    '''
+    return common.values(items_bytes(data, prefix, *args, **kwargs))
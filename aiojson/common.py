@@ -1,9 +1,19 @@
 '''
 Backend independent higher level interfaces, common exceptions.
 '''
+import asyncio
+import collections
+import dataclasses
 import decimal
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import time
 
-from .utils.aiogen import aiogen
+from .utils.aiogen import agenerator
 
 
 class JSONError(Exception):
@@ -20,6 +30,381 @@ class IncompleteJSONError(JSONError):
     pass
 
 
+# the event ending the container each start event opens
+END_EVENTS = {
+    'start_map': 'end_map',
+    'start_array': 'end_array',
+}
+
+
+class AdaptiveReadSize(object):
+    '''
+    Read size for the functions taking a buf_size, adapting to the stream
+    instead of staying fixed.  Reads start at min_size and double, up to
+    max_size, while they come back full, which means data is waiting.  They
+    halve again when they come back mostly empty.  With asyncio and aiohttp
+    StreamReaders, the data they have buffered already is looked at too:
+    reads grow straight to fit it, and a short read is topped up with more
+    reads while the reader has data ready, rather than passed on to the
+    parser in small pieces.
+
+    Counts of the reads are kept in the attributes, see snapshot, and if
+    given, hook is called after each read with the size asked for and the
+    size received.
+    '''
+    def __init__(self, min_size=4 * 1024, max_size=256 * 1024, hook=None):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.hook = hook
+        self.size = min_size
+        self.reads = 0
+        self.bytes = 0
+        self.short_reads = 0
+        self.coalesced = 0
+        self.largest = 0
+
+    async def read(self, stream):
+        size = self.size
+        ready = self.buffered(stream)
+        if ready > size:
+            size = min(self.max_size, max(ready, size))
+        data = await stream.read(size)
+        received = len(data)
+        if 0 < received < self.min_size and self.buffered(stream):
+            parts = [data]
+            while received < self.min_size and self.buffered(stream):
+                more = await stream.read(size - received)
+                if not more:
+                    break
+                parts.append(more)
+                received += len(more)
+                self.coalesced += 1
+            data = ''.join(parts) if isinstance(data, str) else b''.join(parts)
+        self.record(size, received)
+        return data
+
+    def buffered(self, stream):
+        '''
+        Returns how many bytes the stream is known to have ready.
+        '''
+        buffer = getattr(stream, '_buffer', None)
+        if isinstance(buffer, (bytes, bytearray)):
+            # asyncio.StreamReader
+            return len(buffer)
+        if isinstance(buffer, collections.deque):
+            # aiohttp's StreamReader keeps the chunks received, and returns
+            # no more than one per read
+            return sum(len(chunk) for chunk in buffer)
+        return 0
+
+    def record(self, size, received):
+        self.reads += 1
+        self.bytes += received
+        self.largest = max(self.largest, received)
+        if received >= size:
+            self.size = min(self.max_size, size * 2)
+        elif received < size // 4:
+            self.short_reads += 1
+            self.size = max(self.min_size, size // 2)
+        if self.hook is not None:
+            self.hook(size, received)
+
+    def snapshot(self):
+        return {
+            'size': self.size,
+            'reads': self.reads,
+            'bytes': self.bytes,
+            'short_reads': self.short_reads,
+            'coalesced': self.coalesced,
+            'largest': self.largest,
+        }
+
+
+def read_chunk(stream, buf_size):
+    '''
+    Reads the next chunk from stream, buf_size being a number of bytes or an
+    AdaptiveReadSize.
+    '''
+    if isinstance(buf_size, AdaptiveReadSize):
+        return buf_size.read(stream)
+    return stream.read(buf_size)
+
+
+class ParseStats(object):
+    '''
+    Statistics of a parse, for the functions taking a stats argument: how
+    much was read and in how many reads, the time spent awaiting reads
+    (io_time), feeding the parser (parse_time, tokenizing and producing
+    events) and in items building objects and tracking prefixes
+    (build_time), the numbers of tokens (python backend only) and events,
+    the deepest nesting of containers and the largest the lexer buffer got
+    (python backend only).
+
+    The counts are in the attributes, or as a dict from snapshot.  If given,
+    callback is called with a snapshot after each chunk is parsed.
+    '''
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.bytes_read = 0
+        self.reads = 0
+        self.io_time = 0.0
+        self.parse_time = 0.0
+        self.build_time = 0.0
+        self.tokens = 0
+        self.events = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.peak_buffer = 0
+
+    def read(self, size, elapsed):
+        self.reads += 1
+        self.bytes_read += size
+        self.io_time += elapsed
+
+    def parsed(self, parser, events, elapsed):
+        self.parse_time += elapsed
+        self.events += len(events)
+        depth = self.depth
+        for event, value in events:
+            if event == 'start_map' or event == 'start_array':
+                depth += 1
+                if depth > self.max_depth:
+                    self.max_depth = depth
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+        self.depth = depth
+        self.tokens = getattr(parser, 'tokens', None) or 0
+        buffer = getattr(parser, 'buffer', None)
+        if buffer is not None:
+            self.peak_buffer = max(self.peak_buffer, len(buffer))
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+    def snapshot(self):
+        return {
+            'bytes_read': self.bytes_read,
+            'reads': self.reads,
+            'io_time': self.io_time,
+            'parse_time': self.parse_time,
+            'build_time': self.build_time,
+            'tokens': self.tokens,
+            'events': self.events,
+            'max_depth': self.max_depth,
+            'peak_buffer': self.peak_buffer,
+        }
+
+
+def count_tokens(parser):
+    '''
+    Has a parser count its tokens, if it can, for ParseStats.
+    '''
+    if hasattr(parser, 'tokens'):
+        parser.tokens = 0
+
+
+async def release_stream(stream, close=True):
+    '''
+    Closes a stream as asked by a close_stream option: `close` is a function
+    to call, or true for the stream's own close method, if it has one.  aiohttp responses or sockets
+    are closed by passing their close function, as their content streams
+    have no close.  Returns whether anything was called.
+    '''
+    if not close:
+        return False
+    if not callable(close):
+        close = getattr(stream, 'close', None)
+        if close is None:
+            return False
+    result = close()
+    if inspect.isawaitable(result):
+        await result
+    return True
+
+
+async def aclose(iterator, close_stream=False):
+    '''
+    Stops an iterator of events before its end, and those it reads from down
+    to the stream, which is closed too if asked, see release_stream.  The
+    task of an aiogen generator is cancelled.  Iterators which can't be
+    stopped are left alone.
+    '''
+    if isinstance(iterator, agenerator):
+        await iterator.aclose()
+        return
+    close = getattr(iterator, 'aclose', None)
+    if close is not None:
+        await close(close_stream)
+
+
+class read_batches:
+    '''
+    Iterator reading chunks from an asyncio stream into a push parser (the
+    Parser of a backend), yielding the list of events each chunk completed.
+    Chunks completing no event are skipped, so lists are never empty.  If a
+    ParseStats is given, reads and parsing are measured into it.
+    '''
+    def __init__(self, stream, parser, buf_size, stats=None):
+        self.stream = stream
+        self.parser = parser
+        self.buf_size = buf_size
+        self.stream_done = False
+        self.stats = stats
+        if stats is not None:
+            count_tokens(parser)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.stats is not None:
+            return await self._measured_next()
+        while not self.stream_done:
+            data = await read_chunk(self.stream, self.buf_size)
+            if len(data) > 0:
+                events = self.parser.feed(data)
+            else:
+                self.stream_done = True
+                events = self.parser.close()
+            if events:
+                return events
+        raise StopAsyncIteration
+
+    async def _measured_next(self):
+        stats = self.stats
+        while not self.stream_done:
+            start = time.perf_counter()
+            data = await read_chunk(self.stream, self.buf_size)
+            read = time.perf_counter()
+            stats.read(len(data), read - start)
+            if len(data) > 0:
+                events = self.parser.feed(data)
+            else:
+                self.stream_done = True
+                events = self.parser.close()
+            stats.parsed(self.parser, events, time.perf_counter() - read)
+            if events:
+                return events
+        raise StopAsyncIteration
+
+    async def aclose(self, close_stream=False):
+        '''
+        Stops reading, leaving the rest of the stream unread, and closes the
+        stream if asked, see release_stream.
+        '''
+        self.stream_done = True
+        await release_stream(self.stream, close_stream)
+
+    async def next(self):
+        return await self.__anext__()
+
+
+class advance_batches:
+    '''
+    Iterator advancing a parser over data it holds whole (a MappedParser of
+    the python backend) by size bytes at a time, yielding the list of events
+    each step completed.  Other tasks get to run between steps, as they
+    would while waiting on a stream.
+    '''
+    def __init__(self, parser, size, stats=None):
+        self.parser = parser
+        self.size = size
+        self.done = False
+        self.stats = stats
+        if stats is not None:
+            count_tokens(parser)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.done:
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            parser = self.parser
+            events = parser.advance(self.size)
+            if events is None:
+                events = parser.close()
+                self._release()
+            if self.stats is not None:
+                self.stats.parsed(parser, events, time.perf_counter() - start)
+            if events:
+                return events
+        raise StopAsyncIteration
+
+    def _release(self):
+        # the parser holds views of the mapped data, which keep it from
+        # being unmapped when the stream is closed
+        self.done = True
+        self.parser = None
+
+    async def aclose(self, close_stream=False):
+        '''
+        Stops advancing.  The mapped data belongs to the stream it was taken
+        from, which its owner closes, so close_stream is ignored.
+        '''
+        self._release()
+
+    async def next(self):
+        return await self.__anext__()
+
+
+class unbatch:
+    '''
+    Iterator yielding one at a time the events from an iterator of lists of
+    events, so per-event consumers only await once per list.
+    '''
+    def __init__(self, batches):
+        self.batches = batches
+        self.events = iter(())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            try:
+                return next(self.events)
+            except StopIteration:
+                self.events = iter(await self.batches.next())
+
+    async def aclose(self, close_stream=False):
+        self.events = iter(())
+        await aclose(self.batches, close_stream)
+
+    async def next(self):
+        return await self.__anext__()
+
+
+class BoundedCache(object):
+    '''
+    Values worked out from a parent and a key, such as the prefix of a key
+    under a parent prefix, remembered so each is only worked out once by
+    make(parent, key).  At most maxsize are kept, the cache being emptied
+    when full, for documents with unbounded sets of keys (like maps keyed by
+    ids).  None can't be cached.
+    '''
+    def __init__(self, make, maxsize):
+        self.make = make
+        self.maxsize = maxsize
+        # parent -> key -> value
+        self.parents = {}
+        self.size = 0
+
+    def get(self, parent, key):
+        children = self.parents.get(parent)
+        if children is None:
+            children = self.parents[parent] = {}
+        value = children.get(key)
+        if value is None:
+            if self.size >= self.maxsize:
+                self.parents = {parent: children}
+                children.clear()
+                self.size = 0
+            value = children[key] = self.make(parent, key)
+            self.size += 1
+        return value
+
+
 class parse:
     '''
     An iterator returning parsing events with the information about their location
@@ -29,7 +414,7 @@ class parse:
 
     ('null', None)
     ('boolean', <True or False>)
-    ('number', <int or Decimal>)
+    ('number', <int or Decimal, or as set by use_float/number_factory>)
     ('string', <unicode>)
     ('map_key', <str>)
     ('start_map', None)
@@ -64,39 +449,68 @@ class parse:
 
     '''
 
+    # bound on the number of prefixes remembered, see BoundedCache
+    MAX_CACHED_PREFIXES = 10000
+
     def __init__(self, basic_events):
         self.basic_events = basic_events
-        self.path = []
+        # prefix of the current value, and of each container above it
+        self.prefix = ''
+        self.containers = []
+        # parent prefix -> key -> interned child prefix
+        self.children = BoundedCache(self.make_prefix, self.MAX_CACHED_PREFIXES)
 
-    async def __aiter__(self):
+    def __aiter__(self):
         return self
 
     async def __anext__(self):
         event, value = await self.basic_events.next()
+        return self.prefixed(event, value)
+
+    async def aclose(self, close_stream=False):
+        await aclose(self.basic_events, close_stream)
+
+    def prefixed(self, event, value):
+        '''
+        Tracks the path through one basic event and returns the prefixed event.
+        '''
         if event == 'map_key':
-            prefix = '.'.join(self.path[:-1])
-            self.path[-1] = value
+            prefix = self.containers[-1]
+            self.prefix = self.children.get(prefix, value)
         elif event == 'start_map':
-            prefix = '.'.join(self.path)
-            self.path.append(None)
-        elif event == 'end_map':
-            self.path.pop()
-            prefix = '.'.join(self.path)
+            prefix = self.prefix
+            self.containers.append(prefix)
         elif event == 'start_array':
-            prefix = '.'.join(self.path)
-            self.path.append('item')
-        elif event == 'end_array':
-            self.path.pop()
-            prefix = '.'.join(self.path)
+            prefix = self.prefix
+            self.containers.append(prefix)
+            self.prefix = self.children.get(prefix, 'item')
+        elif event == 'end_map' or event == 'end_array':
+            prefix = self.prefix = self.containers.pop()
         else: # any scalar value
-            prefix = '.'.join(self.path)
+            prefix = self.prefix
 
         return (prefix, event, value)
 
+    @staticmethod
+    def make_prefix(parent, key):
+        return sys.intern(parent + '.' + key if parent else key)
+
     async def next(self):
         return await self.__anext__()
 
 
+class parse_batches(parse):
+    '''
+    Like parse, but reads lists of basic events (as from basic_parse_batches)
+    and returns lists of ``(prefix, type, value)`` events, one per batch.
+    Flattening the lists gives exactly the events of parse.
+    '''
+
+    async def __anext__(self):
+        prefixed = self.prefixed
+        return [prefixed(event, value) for event, value in await self.basic_events.next()]
+
+
 class ObjectBuilder(object):
     '''
     Incrementally builds an object from JSON parser events. Events are passed
@@ -116,59 +530,1166 @@ class ObjectBuilder(object):
             builder.event(event, value)
         print builder.value
 
+    The objects for maps and arrays can be changed with `dict_factory` and
+    `list_factory`, which are called with each complete dict or list and
+    return the object to use instead, for instance a record class or tuple.
+    With either of them containers are only added to their parent once they
+    end, so `value` is only set once the top level value is complete.
     '''
-    def __init__(self):
-        def initial_set(value):
-            self.value = value
-        self.containers = [initial_set]
+    def __init__(self, dict_factory=None, list_factory=None):
+        self.dict_factory = dict_factory
+        self.list_factory = list_factory
+        # whether containers wait for their end to be added to their parent
+        self.deferred = dict_factory is not None or list_factory is not None
+        self.value = None
+        self.key = None
+        # the innermost open container, either a map or an array
+        self.map = None
+        self.array = None
+        # the outer open containers, and when deferred the key each open
+        # container goes under in its parent map
+        self.containers = []
+        self.keys = []
 
     def event(self, event, value):
-        if event == 'map_key':
-            self.key = value
-        elif event == 'start_map':
-            map = {}
-            self.containers[-1](map)
-            def setter(value):
-                map[self.key] = value
-            self.containers.append(setter)
-        elif event == 'start_array':
-            array = []
-            self.containers[-1](array)
-            self.containers.append(array.append)
-        elif event == 'end_array' or event == 'end_map':
-            self.containers.pop()
+        handler = self.handlers.get(event)
+        if handler is not None:
+            handler(self, value)
+        elif self.array is not None:
+            self.array.append(value)
+        elif self.map is not None:
+            self.map[self.key] = value
         else:
-            self.containers[-1](value)
+            self.value = value
+
+    def _map_key(self, value):
+        self.key = value
+
+    def _start_map(self, value):
+        map = {}
+        self._open(map)
+        self.map = map
+        self.array = None
+
+    def _start_array(self, value):
+        array = []
+        self._open(array)
+        self.map = None
+        self.array = array
+
+    def _open(self, container):
+        self.containers.append(self.map if self.array is None else self.array)
+        if self.deferred:
+            self.keys.append(self.key)
+        else:
+            self._add(container)
+
+    def _add(self, value):
+        # to the innermost open container, or as the value at the top
+        if self.array is not None:
+            self.array.append(value)
+        elif self.map is not None:
+            self.map[self.key] = value
+        else:
+            self.value = value
+
+    def _end_map(self, value):
+        value = self.map
+        if self.dict_factory is not None:
+            value = self.dict_factory(value)
+        self._end(value)
+
+    def _end_array(self, value):
+        value = self.array
+        if self.list_factory is not None:
+            value = self.list_factory(value)
+        self._end(value)
+
+    def _end(self, value):
+        parent = self.containers.pop()
+        if parent is None:
+            self.map = self.array = None
+        elif parent.__class__ is list:
+            self.map = None
+            self.array = parent
+        else:
+            self.map = parent
+            self.array = None
+        if self.deferred:
+            self.key = self.keys.pop()
+            self._add(value)
+
+    # events other than scalar values, and what to do with them
+    handlers = {
+        'map_key': _map_key,
+        'start_map': _start_map,
+        'end_map': _end_map,
+        'start_array': _start_array,
+        'end_array': _end_array,
+    }
+
+
+def record_fields(into):
+    '''
+    Returns the names of the fields of a record class: a dataclass, a
+    namedtuple or a class with __slots__.
+    '''
+    if dataclasses.is_dataclass(into):
+        return tuple(field.name for field in dataclasses.fields(into) if field.init)
+    fields = getattr(into, '_fields', None)
+    if fields is not None:
+        return tuple(fields)
+    slots = getattr(into, '__slots__', None)
+    if slots is not None:
+        return (slots,) if isinstance(slots, str) else tuple(slots)
+    raise TypeError("Can't tell the fields of %r" % (into,))
+
+
+class RecordBuilder(ObjectBuilder):
+    '''
+    ObjectBuilder for maps to turn into records: the values of keys which
+    are not fields of the `into` class are dropped without building them,
+    and the complete map is passed to `into` as keyword arguments.  Values
+    which are not maps are left as they are.  Events are given by name, as
+    the parsers emit them; anything else is a TypeError rather than a value.
+    '''
+    def __init__(self, into, dict_factory=None, list_factory=None):
+        super(RecordBuilder, self).__init__(dict_factory, list_factory)
+        self.into = into
+        self.fields = frozenset(record_fields(into))
+        self.depth = 0
+        self.dropping = False
+
+    def event(self, event, value):
+        if event.__class__ is not str:
+            raise TypeError('Events are passed by name, got %r' % (event,))
+        depth = self.depth
+        if event == 'start_map' or event == 'start_array':
+            self.depth = depth + 1
+        elif event == 'end_map' or event == 'end_array':
+            self.depth = depth - 1
+        if depth == 1:
+            # events directly in the record: its keys, scalar values, and
+            # the start and end of its container values
+            if event == 'map_key':
+                self.dropping = value not in self.fields
+            elif event == 'end_map' and self.dropping:
+                self.dropping = False
+        if self.dropping:
+            return
+        super(RecordBuilder, self).event(event, value)
+        if depth == 1 and event == 'end_map':
+            self.value = self.into(**self.value)
 
 
 class items:
     '''
     An iterator returning native Python objects constructed from the events
-    under a given prefix.
+    under a given prefix.  dict_factory and list_factory are passed on to
+    ObjectBuilder.  If `into` is given, maps are returned as records of that
+    class instead, see RecordBuilder.  If the ParseStats the events are
+    measured into is given as stats, the time spent here on top of reading
+    and parsing is added to its build_time.
+
+    The iteration can stop before the end of the events, without reading
+    the rest of the stream: after `limit` objects, or with
+    stop_after_prefix_closed once the parser leaves the part of the document
+    which can hold the prefix, assuming keys don't repeat in a map.  For
+    ``earth.europe.item`` that's the end of the ``earth.europe`` array, for
+    a prefix with no "item" the first object.  The events are then stopped
+    (see aclose) and close_stream is passed on, to close the stream as
+    release_stream does; the stream is also closed at the end of the events.
+
+    The prefix can also be a pattern for, or a, Selector: values are then
+    matched as by select_items, and stop_after_prefix_closed stops once no
+    value left in the document can match.
     '''
-    def __init__(self, prefixed_events, prefix):
+    def __init__(self, prefixed_events, prefix, dict_factory=None, list_factory=None, into=None, stats=None,
+                 limit=None, stop_after_prefix_closed=False, close_stream=False):
         self.prefixed_events = prefixed_events
         self.prefix = prefix
+        self.dict_factory = dict_factory
+        self.list_factory = list_factory
+        self.into = into
+        self.stats = stats
+        self.limit = limit
+        self.close_stream = close_stream
+        self.walk = _Walk(get_selector(prefix)) if is_pattern(prefix) else None
+        self.stop_after_prefix_closed = stop_after_prefix_closed
+        # the prefix of the one container holding all the matches, up to
+        # the first "item", or None when not stopping there
+        self.scope = None
+        if stop_after_prefix_closed and self.walk is None:
+            parts = prefix.split('.') if prefix else []
+            if 'item' in parts:
+                self.scope = '.'.join(parts[:parts.index('item')])
+            else:
+                self.limit = 1 if limit is None else min(limit, 1)
+        self.count = 0
+        self.done = False
 
-    async def __aiter__(self):
+    def __aiter__(self):
         return self
 
     async def __anext__(self):
+        if self.limit is not None and self.count >= self.limit:
+            await self.aclose()
+        if self.done:
+            raise StopAsyncIteration
+        stats = self.stats
+        try:
+            if stats is None:
+                value = await self._next()
+            else:
+                start = time.perf_counter()
+                upstream = stats.io_time + stats.parse_time
+                value = await self._next()
+                stats.build_time += time.perf_counter() - start - (stats.io_time + stats.parse_time - upstream)
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+        self.count += 1
+        if self.limit is not None and self.count >= self.limit:
+            await self.aclose()
+        elif self.walk is not None and self.walk.done and self.stop_after_prefix_closed:
+            await self.aclose()
+        return value
+
+    async def _next(self):
+        if self.walk is not None:
+            return await self._select_next()
         current = None
         # get events til we find one of interest
-        while (current != self.prefix):
-            current, event, value = await self.prefixed_events.next()
-        # now process it
-        if event in ('start_map', 'start_array'):
-            builder = ObjectBuilder()
-            end_event = event.replace('start', 'end')
-            while (current, event) != (self.prefix, end_event):
-                builder.event(event, value)
+        if self.scope is None:
+            while (current != self.prefix):
+                current, event, value = await self.prefixed_events.next()
+        else:
+            scope = self.scope
+            while (current != self.prefix):
                 current, event, value = await self.prefixed_events.next()
-            return builder.value
+                if current == scope and (event == 'end_array' or event == 'end_map'):
+                    raise StopAsyncIteration
+        # now process it, up to the end of the container it starts, which
+        # for the prefix '' could be a container under an empty key
+        if event == 'start_map' or event == 'start_array':
+            return await _build_value(self.prefixed_events.next, event, value, self.dict_factory,
+                                      self.list_factory, self.into, prefixed=True)
         else:
             return value
 
+    async def _select_next(self):
+        walk = self.walk
+        next_event = self.prefixed_events.next
+        while not (walk.done and self.stop_after_prefix_closed):
+            current, event, value = await next_event()
+            if walk.event(event, value):
+                if event == 'start_map' or event == 'start_array':
+                    value = await _build_value(next_event, event, value, self.dict_factory, self.list_factory,
+                                               self.into, prefixed=True)
+                return value
+        raise StopAsyncIteration
+
+    async def aclose(self, close_stream=None):
+        '''
+        Stops the iteration and the events it reads, closing the stream as
+        by close_stream, or the one given to the constructor.
+        '''
+        if close_stream is None:
+            close_stream = self.close_stream
+        if not self.done:
+            self.done = True
+            await aclose(self.prefixed_events, close_stream)
+
+    async def next(self):
+        return await self.__anext__()
+
+
+def parse_events(basic_events):
+    '''
+    Synchronous counterpart of parse, over an iterable of basic events.
+    '''
+    prefixed = parse(None).prefixed
+    return [prefixed(event, value) for event, value in basic_events]
+
+
+def items_events(prefixed_events, prefix, dict_factory=None, list_factory=None, into=None):
+    '''
+    Synchronous counterpart of items, over an iterable of prefixed events,
+    returning the list of objects.  The prefix can be a pattern, as for items.
+    '''
+    if is_pattern(prefix):
+        basic_events = ((event, value) for current, event, value in prefixed_events)
+        return select_events(basic_events, prefix, dict_factory, list_factory, into)
+    found = []
+    builder = None
+    for current, event, value in prefixed_events:
+        if builder is not None:
+            builder.event(event, value)
+            if current == prefix and event == end_event:
+                found.append(builder.value)
+                builder = None
+        elif current == prefix:
+            if event == 'start_map' or event == 'start_array':
+                if into is None:
+                    builder = ObjectBuilder(dict_factory, list_factory)
+                else:
+                    builder = RecordBuilder(into, dict_factory, list_factory)
+                builder.event(event, value)
+                end_event = END_EVENTS[event]
+            else:
+                found.append(value)
+    return found
+
+
+# an "item" part with an index or a slice of indexes, as in item[3] or item[0:100]
+SELECTOR_SLICE = re.compile(r'item\[(\d*)(:?)(\d*)\]\Z')
+
+
+class Selector(object):
+    '''
+    A pattern matching prefixes, compiled once into a state machine which is
+    stepped down the document as it's parsed.  Patterns are dotted like
+    prefixes and each of their parts is one of:
+
+    - a map key, or "item" for any item of an array (or an "item" key)
+    - "item[n]" or "item[start:stop]": the items of an array in that range,
+      either bound of the range can be left out
+    - "*": any one key or array item
+    - "**": any number of keys and array items, including none
+
+    For instance ``earth.*.item``, ``docs.item[0:100]`` or ``**.id``.
+
+    A state is the number of parts matched so far, and the machine is in a
+    set of states at each value.  `step` gives the states for the values of
+    a map or array from the states for the container, and the transitions
+    are cached, so each one is only worked out once.
+
+    Keys containing "*", "[" or "]" can't be given in patterns, wrap plain
+    prefixes with such keys in LiteralPrefix.
+    '''
+
+    # bound on the number of transitions remembered, see BoundedCache
+    MAX_CACHED_TRANSITIONS = 10000
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.parts = []
+        for part in pattern.split('.') if pattern else []:
+            match = SELECTOR_SLICE.match(part)
+            if match is not None:
+                start, colon, stop = match.groups()
+                if not colon and not start:
+                    raise ValueError('Empty index in selector %r' % pattern)
+                start = int(start) if start else 0
+                if colon:
+                    stop = int(stop) if stop else None
+                else:
+                    stop = start + 1
+                self.parts.append(('slice', (start, stop)))
+            elif '[' in part or ']' in part:
+                raise ValueError('Bad part %r in selector %r, use a LiteralPrefix for a plain prefix'
+                                 % (part, pattern))
+            elif part == '**' or part == '*':
+                self.parts.append((part, None))
+            elif part == 'item':
+                self.parts.append(('item', None))
+            else:
+                self.parts.append(('key', part))
+        self.final = len(self.parts)
+        self.start = self._closure([0])
+        self.sliced = any(kind == 'slice' for kind, arg in self.parts)
+        # keys whose values can match a part, which are all we need to
+        # remember having passed in a map
+        self.keys = frozenset(arg if kind == 'key' else 'item'
+                              for kind, arg in self.parts if kind == 'key' or kind == 'item')
+        # without wildcards, the prefix of the values the pattern can match,
+        # for the backends which can skip the rest of the document
+        if any(kind == '*' or kind == '**' for kind, arg in self.parts):
+            self.prefix = None
+        else:
+            self.prefix = '.'.join(arg if kind == 'key' else 'item' for kind, arg in self.parts)
+        self.transitions = BoundedCache(self._step, self.MAX_CACHED_TRANSITIONS)
+
+    def __repr__(self):
+        return 'Selector(%r)' % (self.pattern,)
+
+    def _closure(self, states):
+        '''
+        Returns the frozenset of states, each with the states following the
+        "**" parts it's at, which match no key at all.
+        '''
+        closure = set()
+        for state in states:
+            closure.add(state)
+            while state < self.final and self.parts[state][0] == '**':
+                state += 1
+                closure.add(state)
+        return frozenset(closure)
+
+    def step(self, states, key, index=None):
+        '''
+        Returns the states for the value under `key` in a map, or for the
+        item at `index` in an array if key is None, from the states for
+        the container.
+        '''
+        # indexes only make a difference to patterns with slices
+        if index is None or not self.sliced:
+            return self.transitions.get(states, key)
+        return self._step(states, key, index)
+
+    def _step(self, states, key, index=None):
+        following = []
+        for state in states:
+            if state == self.final:
+                continue
+            kind, arg = self.parts[state]
+            if kind == '**':
+                following.append(state)
+            elif kind == '*':
+                following.append(state + 1)
+            elif kind == 'item':
+                if key is None or key == 'item':
+                    following.append(state + 1)
+            elif kind == 'slice':
+                start, stop = arg
+                if key is None and start <= index and (stop is None or index < stop):
+                    following.append(state + 1)
+            elif key == arg:
+                following.append(state + 1)
+        return self._closure(following)
+
+    def alive(self, states, seen, index=None):
+        '''
+        Tells whether values still to come in a container could match, from
+        the states for the container and the keys of `seen` already passed
+        in it if it's a map, or the index of its next item if it's an array.
+        Keys are assumed not to repeat in a map.
+        '''
+        for state in states:
+            if state == self.final:
+                continue
+            kind, arg = self.parts[state]
+            if kind == '**' or kind == '*':
+                return True
+            if kind == 'slice':
+                if index is not None and (arg[1] is None or index < arg[1]):
+                    return True
+            elif index is None:
+                if (arg if kind == 'key' else 'item') not in seen:
+                    return True
+            elif kind == 'item':
+                return True
+        return False
+
+    def select(self, value):
+        '''
+        Returns the list of the objects matching in an object already built,
+        outermost first as select_items would.
+        '''
+        found = []
+        self._select(value, self.start, found)
+        return found
+
+    def _select(self, value, states, found):
+        if self.final in states:
+            found.append(value)
+        elif not states:
+            return
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                self._select(item, self.step(states, key), found)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                self._select(item, self.step(states, None, index), found)
+
+
+class LiteralPrefix(str):
+    '''
+    A prefix to match as it is, for prefixes with keys containing "*" or
+    "[", which would otherwise be taken as patterns for a Selector.
+    '''
+
+
+def is_pattern(prefix):
+    '''
+    Tells whether a prefix is a Selector or a pattern for one, rather than a
+    plain prefix.  Any prefix with "*" or "[" is taken as a pattern, unless
+    it is a LiteralPrefix.
+    '''
+    if isinstance(prefix, Selector):
+        return True
+    return not isinstance(prefix, LiteralPrefix) and ('*' in prefix or '[' in prefix)
+
+
+# bound on the number of patterns compiled and kept by get_selector
+MAX_CACHED_SELECTORS = 256
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_SELECTORS)
+def _compile(pattern):
+    return Selector(pattern)
+
+
+def get_selector(pattern):
+    '''
+    Returns the Selector for a pattern, compiled once for all the calls
+    given the same pattern, or the Selector given itself.
+    '''
+    if isinstance(pattern, Selector):
+        return pattern
+    return _compile(pattern)
+
+
+class _Frame(object):
+    '''
+    A container walked by a _Walk: the states for it, the keys passed in it
+    for a map and the index of the next item for an array.
+    '''
+    __slots__ = ('states', 'seen', 'index')
+
+    def __init__(self, states, array):
+        self.states = states
+        self.seen = None if array else set()
+        self.index = 0 if array else None
+
+
+class _Walk(object):
+    '''
+    The walk of a Selector down the events of documents, outside of the
+    values matching, which are left to the caller to build.  Once no value
+    left in a document can match, the rest of it is skipped and the walk
+    starts over with the next top level value.
+    '''
+    def __init__(self, selector):
+        self.selector = selector
+        # the containers being walked, the last key seen, and how deep we
+        # are in a container being skipped
+        self.frames = []
+        self.key = None
+        self.skipping = 0
+        # set once no value left in the current document can match, until
+        # the next document starts
+        self.done = False
+
+    def event(self, event, value):
+        '''
+        Takes the next event, returns whether it starts a matching value.
+        '''
+        if self.skipping:
+            if event == 'start_map' or event == 'start_array':
+                self.skipping += 1
+            elif event == 'end_map' or event == 'end_array':
+                self.skipping -= 1
+            return False
+        if event == 'map_key':
+            self.key = value
+            return False
+        frames = self.frames
+        if event == 'end_map' or event == 'end_array':
+            frames.pop()
+            self._check_done()
+            return False
+        # the start of a value, find the states for it
+        selector = self.selector
+        if not frames:
+            states = selector.start
+        else:
+            frame = frames[-1]
+            if frame.index is None:
+                states = selector.step(frame.states, self.key)
+                if self.key in selector.keys:
+                    frame.seen.add(self.key)
+            else:
+                states = selector.step(frame.states, None, frame.index)
+                frame.index += 1
+        if selector.final in states:
+            # the value itself is left to the caller, so the frames are the
+            # same once it's done
+            self._check_done()
+            return True
+        if event == 'start_map' or event == 'start_array':
+            if states:
+                frames.append(_Frame(states, event == 'start_array'))
+                return False
+            self.skipping = 1
+        self._check_done()
+        return False
+
+    def _check_done(self):
+        self.done = self._exhausted()
+        if self.done:
+            # skip the containers still open, which leaves the frames empty
+            # for the next document
+            self.skipping += len(self.frames)
+            del self.frames[:]
+
+    def _exhausted(self):
+        '''
+        Tells whether no value left in the current document can match.
+        Between documents, there's always the next one.
+        '''
+        if not self.frames:
+            return False
+        alive = self.selector.alive
+        for frame in reversed(self.frames):
+            if alive(frame.states, frame.seen, frame.index):
+                return False
+        return True
+
+
+class select_items:
+    '''
+    An iterator returning native Python objects constructed from the values
+    matching a Selector (or pattern for one) in unprefixed events, like items
+    does for a plain prefix.  Values within a value already returned aren't
+    returned on their own.
+
+    Containers which can't contain any match are skipped over, and so is the
+    rest of a document once no value left in it can match, for instance when
+    all the items of a bounded slice have been returned.  Matching then
+    starts over with the next document, if the stream has several.  With
+    stop_after_prefix_closed, the iteration stops there instead, without
+    taking any more events, so the rest of the stream isn't read.  That
+    assumes no map repeats a key, and that the stream holds one document.
+    `limit` and close_stream are as for items.
+    '''
+    def __init__(self, basic_events, selector, dict_factory=None, list_factory=None, into=None, stats=None,
+                 limit=None, stop_after_prefix_closed=False, close_stream=False):
+        self.basic_events = basic_events
+        self.walk = _Walk(get_selector(selector))
+        self.dict_factory = dict_factory
+        self.list_factory = list_factory
+        self.into = into
+        self.stats = stats
+        self.limit = limit
+        self.stop_after_prefix_closed = stop_after_prefix_closed
+        self.close_stream = close_stream
+        self.count = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.limit is not None and self.count >= self.limit:
+            await self.aclose()
+        if self.closed:
+            raise StopAsyncIteration
+        stats = self.stats
+        try:
+            if stats is None:
+                value = await self._next()
+            else:
+                start = time.perf_counter()
+                upstream = stats.io_time + stats.parse_time
+                value = await self._next()
+                stats.build_time += time.perf_counter() - start - (stats.io_time + stats.parse_time - upstream)
+        except StopAsyncIteration:
+            await self.aclose()
+            raise
+        self.count += 1
+        if self.walk.done and self.stop_after_prefix_closed:
+            await self.aclose()
+        elif self.limit is not None and self.count >= self.limit:
+            await self.aclose()
+        return value
+
+    async def _next(self):
+        walk = self.walk
+        next_event = self.basic_events.next
+        while not (walk.done and self.stop_after_prefix_closed):
+            event, value = await next_event()
+            if walk.event(event, value):
+                if event == 'start_map' or event == 'start_array':
+                    value = await _build_value(next_event, event, value, self.dict_factory, self.list_factory,
+                                               self.into)
+                return value
+        raise StopAsyncIteration
+
+    async def aclose(self, close_stream=None):
+        '''
+        Stops the iteration and the events it reads, as items.aclose.
+        '''
+        if close_stream is None:
+            close_stream = self.close_stream
+        if not self.closed:
+            self.closed = True
+            await aclose(self.basic_events, close_stream)
+
+    async def next(self):
+        return await self.__anext__()
+
+
+async def _build_value(next_event, event, value, dict_factory, list_factory, into, prefixed=False):
+    '''
+    Builds the value started by event, taking the rest of its events from
+    next_event, prefixed ones if `prefixed`.
+    '''
+    if into is None:
+        builder = ObjectBuilder(dict_factory, list_factory)
+    else:
+        builder = RecordBuilder(into, dict_factory, list_factory)
+    builder.event(event, value)
+    depth = 1
+    while depth:
+        if prefixed:
+            current, event, value = await next_event()
+        else:
+            event, value = await next_event()
+        if event == 'start_map' or event == 'start_array':
+            depth += 1
+        elif event == 'end_map' or event == 'end_array':
+            depth -= 1
+        builder.event(event, value)
+    return builder.value
+
+
+def select_events(basic_events, selector, dict_factory=None, list_factory=None, into=None):
+    '''
+    Synchronous counterpart of select_items, over an iterable of basic
+    events, returning the list of objects.
+    '''
+    walk = _Walk(get_selector(selector))
+    found = []
+    builder = None
+    for event, value in basic_events:
+        if builder is not None:
+            if event == 'start_map' or event == 'start_array':
+                depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+            builder.event(event, value)
+            if depth:
+                continue
+            found.append(builder.value)
+            builder = None
+        elif walk.event(event, value):
+            if event == 'start_map' or event == 'start_array':
+                if into is None:
+                    builder = ObjectBuilder(dict_factory, list_factory)
+                else:
+                    builder = RecordBuilder(into, dict_factory, list_factory)
+                builder.event(event, value)
+                depth = 1
+                continue
+            found.append(value)
+    return found
+
+
+class values:
+    '''
+    An iterator returning the values of a list, for the async wrappers of
+    the functions parsing documents already in memory.
+    '''
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.values)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def next(self):
+        return await self.__anext__()
+
+
+class items_multi:
+    '''
+    An iterator returning native Python objects constructed from the events
+    under any of several prefixes, in a single pass over the events.
+
+    `targets` maps each prefix to a tag, which can be anything (a name, a
+    handler to call...), and the iterator returns ``(tag, object)`` pairs in
+    document order.  Prefixes may be nested, then an object under both is
+    returned for each of them, the inner one first.  dict_factory and
+    list_factory are passed on to ObjectBuilder.  Patterns aren't supported
+    here, see items.
+    '''
+    def __init__(self, prefixed_events, targets, dict_factory=None, list_factory=None):
+        for prefix in targets:
+            if is_pattern(prefix):
+                raise ValueError('items_multi takes plain prefixes, not the pattern %r' % (prefix,))
+        self.prefixed_events = prefixed_events
+        self.targets = targets
+        self.dict_factory = dict_factory
+        self.list_factory = list_factory
+        # (prefix, end event, tag, builder) of the objects being built, outermost first
+        self.building = []
+        self.ready = collections.deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        targets = self.targets
+        building = self.building
+        ready = self.ready
+        while not ready:
+            current, event, value = await self.prefixed_events.next()
+            for prefix, end_event, tag, builder in building:
+                builder.event(event, value)
+            if building and building[-1][:2] == (current, event):
+                prefix, end_event, tag, builder = building.pop()
+                ready.append((tag, builder.value))
+            elif current in targets and event != 'map_key' and event != 'end_map' and event != 'end_array':
+                tag = targets[current]
+                if event in ('start_map', 'start_array'):
+                    builder = ObjectBuilder(self.dict_factory, self.list_factory)
+                    builder.event(event, value)
+                    building.append((current, END_EVENTS[event], tag, builder))
+                else:
+                    ready.append((tag, value))
+        return ready.popleft()
+
+    async def next(self):
+        return await self.__anext__()
+
+
+class documents:
+    '''
+    An iterator returning each top level value of a stream of concatenated
+    JSON documents (like JSON Lines) as a native Python object.  If prefix is
+    given, it returns instead for each document the list of the objects under
+    that prefix in it, so document boundaries stay visible.  dict_factory
+    and list_factory are passed on to ObjectBuilder.  The prefix can be a
+    pattern, as for items.
+    '''
+    def __init__(self, prefixed_events, prefix=None, dict_factory=None, list_factory=None):
+        self.prefixed_events = prefixed_events
+        self.prefix = prefix
+        self.dict_factory = dict_factory
+        self.list_factory = list_factory
+        if prefix is None:
+            self.items = items(prefixed_events, '', dict_factory, list_factory)
+        self.selector = get_selector(prefix) if prefix is not None and is_pattern(prefix) else None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.prefix is None:
+            return await self.items.next()
+        if self.selector is not None:
+            return await self._select_next()
+        prefix = self.prefix
+        found = []
+        builder = None
+        # containers open in the document, and when the one being built opened:
+        # prefixes can't tell, as a value under an empty key at the top has
+        # the same prefix as the document
+        depth = 0
+        while True:
+            current, event, value = await self.prefixed_events.next()
+            if builder is not None:
+                builder.event(event, value)
+            elif current == prefix and event != 'map_key' and event != 'end_map' and event != 'end_array':
+                if event == 'start_map' or event == 'start_array':
+                    builder = ObjectBuilder(self.dict_factory, self.list_factory)
+                    builder.event(event, value)
+                    builder_depth = depth
+                else:
+                    found.append(value)
+            if event == 'start_map' or event == 'start_array':
+                depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+                if builder is not None and depth == builder_depth:
+                    found.append(builder.value)
+                    builder = None
+            # the end of the top level value finishes the document
+            if not depth:
+                return found
+
+    async def _select_next(self):
+        # the document is read to its end, so the walk isn't stopped early
+        walk = _Walk(self.selector)
+        next_event = self.prefixed_events.next
+        found = []
+        depth = 0
+        while True:
+            current, event, value = await next_event()
+            if walk.event(event, value):
+                if event == 'start_map' or event == 'start_array':
+                    # read up to its end, leaving depth as it was
+                    value = await _build_value(next_event, event, value, self.dict_factory, self.list_factory,
+                                               None, prefixed=True)
+                found.append(value)
+            elif event == 'start_map' or event == 'start_array':
+                depth += 1
+            elif event == 'end_map' or event == 'end_array':
+                depth -= 1
+            # the end of the top level value finishes the document
+            if not depth:
+                return found
+
+    async def next(self):
+        return await self.__anext__()
+
+
+def select(value, prefix):
+    '''
+    Returns the list of the objects under prefix in an object already built,
+    where an "item" part of the prefix matches each item of a list as well
+    as an "item" key.  The prefix can be a pattern, as for items.
+    '''
+    if is_pattern(prefix):
+        return get_selector(prefix).select(value)
+    found = [value]
+    for part in prefix.split('.') if prefix else []:
+        inner = []
+        for value in found:
+            if isinstance(value, dict):
+                if part in value:
+                    inner.append(value[part])
+            elif part == 'item' and isinstance(value, list):
+                inner.extend(value)
+        found = inner
+    return found
+
+
+class jsonl:
+    '''
+    An iterator returning each line of a newline delimited JSON (JSON Lines)
+    stream as a native Python object, or with a prefix the list of the
+    objects under it in each line, like documents, so lines stay apart
+    (parallel_jsonl returns the objects themselves).  Lines are decoded whole
+    by the C decoder of the json module rather than event by event, numbers
+    are converted with number_factory for all numbers or else with
+    float_number or number for numbers with a fraction or exponent.  Blank
+    lines are skipped.
+    '''
+    def __init__(self, stream, buf_size, prefix=None, use_float=False, number_factory=None):
+        self.stream = stream
+        self.buf_size = buf_size
+        self.prefix = prefix
+        self.decoder = line_decoder(use_float, number_factory)
+        self.newline = None
+        # start of the line split over the chunks read so far
+        self.pending = []
+        self.lines = collections.deque()
+        self.line_number = 0
+        self.stream_done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        lines = self.lines
+        while True:
+            while not lines:
+                if self.stream_done:
+                    raise StopAsyncIteration
+                await self._read()
+            line = lines.popleft()
+            self.line_number += 1
+            if line.strip():
+                return self._decode(line)
+
+    async def _read(self):
+        data = await read_chunk(self.stream, self.buf_size)
+        if isinstance(data, memoryview):
+            # from a MappedStreamReader, lines are cut out of bytes
+            data = data.tobytes()
+        if len(data) == 0:
+            self.stream_done = True
+            if self.pending:
+                self.lines.append(self.pending[0][:0].join(self.pending))
+                self.pending = []
+            return
+        if self.newline is None:
+            self.newline = '\n' if isinstance(data, str) else b'\n'
+        chunk_lines = data.split(self.newline)
+        if len(chunk_lines) > 1:
+            self.pending.append(chunk_lines[0])
+            chunk_lines[0] = data[:0].join(self.pending)
+            self.pending = [chunk_lines.pop()]
+            self.lines.extend(chunk_lines)
+        else:
+            self.pending.append(data)
+
+    def _decode(self, line):
+        if not isinstance(line, str):
+            line = line.decode('utf-8')
+        try:
+            value = self.decoder.decode(line)
+        except ValueError as e:
+            raise JSONError('Line %d: %s' % (self.line_number, e))
+        if self.prefix is not None:
+            return select(value, self.prefix)
+        return value
+
+    async def next(self):
+        return await self.__anext__()
+
+
+def _reject_constant(name):
+    raise ValueError('Unexpected symbol %r' % name)
+
+
+def line_decoder(use_float=False, number_factory=None):
+    '''
+    Returns a json.JSONDecoder converting numbers like the backends do, and
+    rejecting NaN and Infinity like them too.
+    '''
+    if number_factory is None:
+        return json.JSONDecoder(parse_float=get_number_factory(use_float), parse_constant=_reject_constant)
+    return json.JSONDecoder(parse_float=number_factory, parse_int=number_factory,
+                            parse_constant=_reject_constant)
+
+
+def decode_lines(block, first_line=1, prefix=None, use_float=False, number_factory=None):
+    '''
+    Decodes a block of whole lines of newline delimited JSON, returning the
+    list of their values, or with a prefix of the objects under it in all
+    the lines, in order.  first_line is the number of the first line of the block in
+    the stream, for error messages.  Used by parallel_jsonl in worker
+    processes or threads, so all arguments have to be picklable.
+    '''
+    decoder = line_decoder(use_float, number_factory)
+    if not isinstance(block, str):
+        block = block.decode('utf-8')
+    values = []
+    for line_number, line in enumerate(block.split('\n'), first_line):
+        if not line.strip():
+            continue
+        try:
+            value = decoder.decode(line)
+        except ValueError as e:
+            raise JSONError('Line %d: %s' % (line_number, e))
+        if prefix is None:
+            values.append(value)
+        else:
+            values.extend(select(value, prefix))
+    return values
+
+
+class parallel_jsonl:
+    '''
+    An iterator returning the values of a newline delimited JSON stream like
+    jsonl, decoding them in an executor.  With a prefix it returns the
+    objects under it one at a time like items, not a list per line like
+    jsonl: lines are decoded by blocks, which don't keep them apart.  The stream is cut into blocks of
+    whole lines of about block_size, and each block is decoded by
+    decode_lines in the executor: a ProcessPoolExecutor spreads the work
+    over several cores, a thread pool (None for the loop's default one) only
+    keeps the decoding off the event loop thread.
+
+    With ordered set values come in stream order, otherwise blocks are
+    returned as soon as they are decoded.  At most max_pending blocks (by
+    default twice the number of CPUs) are read ahead of the consumer; a
+    consumer stopping early should call aclose so they aren't decoded for
+    nothing.
+    '''
+    def __init__(self, stream, executor, buf_size, block_size=1024 * 1024, prefix=None,
+                 use_float=False, number_factory=None, ordered=True, max_pending=None):
+        self.stream = stream
+        self.executor = executor
+        self.buf_size = buf_size
+        self.block_size = block_size
+        self.options = (prefix, use_float, number_factory)
+        self.ordered = ordered
+        self.max_pending = max_pending or 2 * (os.cpu_count() or 1)
+        self.newline = None
+        # data read but not sent to a block yet, its size, and where in it
+        # the last whole line ends: the index of the chunk and the offset
+        self.chunks = []
+        self.size = 0
+        self.cut = None
+        self.first_line = 1
+        self.pending = collections.deque()
+        self.values = collections.deque()
+        self.stream_done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.values:
+            await self._fill()
+            if not self.pending:
+                raise StopAsyncIteration
+            if self.ordered:
+                self.values.extend(await self.pending.popleft())
+            else:
+                done, running = await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+                future = done.pop()
+                self.pending.remove(future)
+                self.values.extend(future.result())
+        return self.values.popleft()
+
+    async def _fill(self):
+        '''
+        Reads blocks and starts decoding them, until max_pending are.
+        '''
+        while len(self.pending) < self.max_pending and not self.stream_done:
+            data = await read_chunk(self.stream, self.buf_size)
+            if isinstance(data, memoryview):
+                # from a MappedStreamReader, blocks are joined and sent as bytes
+                data = data.tobytes()
+            if len(data) == 0:
+                self.stream_done = True
+                if self.size:
+                    self._submit(self.chunks[0][:0].join(self.chunks))
+                continue
+            if self.newline is None:
+                self.newline = '\n' if isinstance(data, str) else b'\n'
+            self.chunks.append(data)
+            self.size += len(data)
+            # only the new chunk is searched, so a line longer than a block
+            # isn't searched again with every read
+            end = data.rfind(self.newline) + 1
+            if end:
+                self.cut = (len(self.chunks) - 1, end)
+            if self.size >= self.block_size and self.cut is not None:
+                self._cut()
+
+    def _cut(self):
+        '''
+        Submits the whole lines buffered as a block, keeping the rest.
+        '''
+        chunks = self.chunks
+        index, end = self.cut
+        last = chunks[index]
+        block = last[:0].join(chunks[:index] + [last[:end]])
+        self._submit(block)
+        rest = last[end:]
+        self.chunks = ([rest] if rest else []) + chunks[index + 1:]
+        self.size -= len(block)
+        self.cut = None
+
+    def _submit(self, block):
+        loop = asyncio.get_running_loop()
+        self.pending.append(loop.run_in_executor(
+            self.executor, decode_lines, block, self.first_line, *self.options))
+        self.first_line += block.count(self.newline)
+
+    def cancel(self):
+        '''
+        Cancels the decoding of the blocks read ahead, for consumers which
+        stop early.
+        '''
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+
+    async def aclose(self, close_stream=False):
+        '''
+        Stops reading, cancelling the decoding of the blocks read ahead and
+        dropping the values not returned yet, and closes the stream if
+        asked, see release_stream.
+        '''
+        self.cancel()
+        self.values.clear()
+        self.chunks = []
+        self.size = 0
+        self.cut = None
+        self.stream_done = True
+        await release_stream(self.stream, close_stream)
+
     async def next(self):
         return await self.__anext__()
 
@@ -177,9 +1698,37 @@ def number(str_value):
     '''
     Converts string with a numeric value into an int or a Decimal.
     Used in different backends for consistent number representation.
+    Integers are converted straight to int, only numbers with a fraction or
+    an exponent go through Decimal.
     '''
+    if '.' not in str_value and 'e' not in str_value and 'E' not in str_value:
+        try:
+            return int(str_value)
+        except ValueError:
+            pass
     number = decimal.Decimal(str_value)
     int_number = int(number)
     if int_number == number:
         number = int_number
     return number
+
+
+def float_number(str_value):
+    '''
+    Converts string with a numeric value into an int, or a float if it has a
+    fraction or an exponent.  Much faster than number, but floats may lose
+    precision.
+    '''
+    if '.' in str_value or 'e' in str_value or 'E' in str_value:
+        return float(str_value)
+    return int(str_value)
+
+
+def get_number_factory(use_float=False, number_factory=None):
+    '''
+    Returns the function backends should convert numbers with: number_factory
+    if given, float_number if use_float is set, or else number.
+    '''
+    if number_factory is not None:
+        return number_factory
+    return float_number if use_float else number
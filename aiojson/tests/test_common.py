@@ -0,0 +1,238 @@
+# -*- coding:utf-8 -*-
+from .. import common
+
+from ..backends.tests.data import ARRAY_EVENTS, MAP_EVENTS, MAP_PREFIXED_EVENTS
+
+
+def prefix_all(parser, events):
+    return [parser.prefixed(event, value) for event, value in events]
+
+
+def test_parse_prefixes():
+    assert prefix_all(common.parse(None), MAP_EVENTS) == MAP_PREFIXED_EVENTS
+
+
+def test_parse_prefixes_interned():
+    events = prefix_all(common.parse(None), MAP_EVENTS)
+    metas = [prefix for prefix, event, value in events if prefix == 'docs.item.meta']
+    assert len(metas) > 1
+    assert all(prefix is metas[0] for prefix in metas)
+
+
+def test_parse_prefixes_cache_bounded():
+    parser = common.parse(None)
+    parser.children.maxsize = 5
+    events = [('start_map', None)]
+    for i in range(20):
+        events += [('map_key', 'key%d' % i), ('start_array', None), ('number', i), ('end_array', None)]
+    events.append(('end_map', None))
+    prefixed = prefix_all(parser, events)
+    assert parser.children.size <= 5
+    assert ('key7.item', 'number', 7) in prefixed
+    assert prefixed[-1] == ('', 'end_map', None)
+
+
+def test_number_types():
+    import decimal
+    assert common.number('12345') == 12345 and type(common.number('-7')) is int
+    assert common.number('1.0') == 1 and type(common.number('1.0')) is int
+    assert common.number('1.5') == decimal.Decimal('1.5')
+    assert common.number('1e3') == 1000
+
+
+def test_number_invalid():
+    import decimal
+    try:
+        common.number('1x')
+    except decimal.InvalidOperation:
+        pass
+    else:
+        assert False, 'expected InvalidOperation'
+
+
+def test_float_number():
+    assert type(common.float_number('12')) is int
+    assert common.float_number('1.5') == 1.5 and type(common.float_number('1.5')) is float
+    assert common.float_number('-2E2') == -200.0
+
+
+def test_get_number_factory():
+    assert common.get_number_factory() is common.number
+    assert common.get_number_factory(use_float=True) is common.float_number
+    assert common.get_number_factory(True, str) is str
+
+
+def build(events, into=None, **kwargs):
+    if into is None:
+        builder = common.ObjectBuilder(**kwargs)
+    else:
+        builder = common.RecordBuilder(into, **kwargs)
+    for event, value in events:
+        builder.event(event, value)
+    return builder.value
+
+
+def test_object_builder():
+    assert build(MAP_EVENTS)['docs'][1:] == [{'meta': [[1], {}]}, {'meta': {'key': 'value'}}, {'meta': None}]
+    assert build(ARRAY_EVENTS) == [1, 'is', False, 2]
+
+
+def test_object_builder_scalar():
+    assert build([('string', 'value')]) == 'value'
+
+
+def test_object_builder_partial():
+    # without factories the value is there before its end, as far as built
+    events = [('start_map', None), ('map_key', 'a'), ('start_array', None), ('number', 1),
+              ('start_map', None), ('map_key', 'b'), ('null', None)]
+    assert build(events) == {'a': [1, {'b': None}]}
+    assert build(events[:3]) == {'a': []}
+    assert build(events, list_factory=tuple) is None
+
+
+def test_object_builder_factories():
+    events = [('start_map', None), ('map_key', 'a'), ('start_array', None), ('number', 1),
+              ('start_map', None), ('map_key', 'b'), ('null', None), ('end_map', None),
+              ('end_array', None), ('map_key', 'c'), ('number', 2), ('end_map', None)]
+    assert build(events) == {'a': [1, {'b': None}], 'c': 2}
+    value = build(events, dict_factory=lambda map: tuple(sorted(map.items())), list_factory=tuple)
+    assert value == (('a', (1, (('b', None),))), ('c', 2))
+
+
+def test_record_fields():
+    import collections
+    import dataclasses
+
+    @dataclasses.dataclass
+    class Data:
+        a: int
+        b: int = 0
+
+    class Slots:
+        __slots__ = ('a', 'b')
+
+    assert common.record_fields(Data) == ('a', 'b')
+    assert common.record_fields(collections.namedtuple('Tuple', 'a b')) == ('a', 'b')
+    assert common.record_fields(Slots) == ('a', 'b')
+    try:
+        common.record_fields(dict)
+    except TypeError:
+        pass
+    else:
+        assert False, 'expected TypeError'
+
+
+def test_record_builder():
+    import collections
+    Point = collections.namedtuple('Point', 'x y')
+    events = [('start_map', None), ('map_key', 'x'), ('number', 1), ('map_key', 'tags'),
+              ('start_array', None), ('start_map', None), ('map_key', 'x'), ('number', 5), ('end_map', None),
+              ('end_array', None), ('map_key', 'y'), ('start_map', None), ('map_key', 'z'), ('number', 2),
+              ('end_map', None), ('map_key', 'name'), ('string', 'p'), ('end_map', None)]
+    assert build(events, into=Point) == Point(1, {'z': 2})
+
+
+def test_record_builder_event_names():
+    import collections
+    Point = collections.namedtuple('Point', 'x y')
+    try:
+        build([(5, None), (4, 'x'), (2, 1), (6, None)], into=Point)
+    except TypeError:
+        pass
+    else:
+        assert False, 'expected TypeError'
+
+
+def test_selector_parts():
+    selector = common.Selector('docs.item[0:100].*.**')
+    assert selector.parts == [('key', 'docs'), ('slice', (0, 100)), ('*', None), ('**', None)]
+    assert selector.prefix is None
+    assert common.Selector('a.item[3]').parts[1] == ('slice', (3, 4))
+    assert common.Selector('a.item[2:].b').prefix == 'a.item.b'
+    for pattern in ('a.item[]', 'a[0]', 'item[x]'):
+        try:
+            common.Selector(pattern)
+        except ValueError:
+            pass
+        else:
+            assert False, 'expected ValueError for %r' % pattern
+
+
+def test_selector_step():
+    selector = common.Selector('**.id')
+    states = selector.step(selector.start, 'a')
+    assert selector.step(states, None, 5) == states
+    assert selector.final in selector.step(states, 'id')
+    assert selector.step(states, 'b') is selector.step(states, 'b')
+    sliced = common.Selector('item[1:3]')
+    assert [sliced.final in sliced.step(sliced.start, None, index) for index in range(4)] == [False, True, True, False]
+
+
+def test_selector_alive():
+    selector = common.Selector('a.item[0:2]')
+    assert selector.alive(selector.start, set())
+    assert not selector.alive(selector.start, {'a'})
+    states = selector.step(selector.start, 'a')
+    assert selector.alive(states, None, 1)
+    assert not selector.alive(states, None, 2)
+    assert common.Selector('*').alive(selector.start, {'a'})
+
+
+def test_is_pattern():
+    assert not common.is_pattern('docs.item')
+    assert common.is_pattern('docs.item[0]') and common.is_pattern('**.id')
+    assert common.is_pattern(common.Selector('docs'))
+
+
+def test_items_aclose_cancels_aiogen():
+    import asyncio
+    from ..utils.aiogen import aiogen
+
+    @aiogen(maxsize=1)
+    async def produce(send):
+        for event in MAP_PREFIXED_EVENTS * 100:
+            await send(event)
+
+    async def consume():
+        events = produce()
+        found = common.items(events, 'docs.item', limit=1)
+        assert 'null' in await found.next()
+        return events.task.cancelled()
+    assert asyncio.get_event_loop().run_until_complete(consume())
+
+
+def test_selector_select():
+    value = {'a': [{'id': 1, 'b': {'id': 2}}, {'id': 3}], 'id': 4}
+    assert common.get_selector('**.id').select(value) == [1, 2, 3, 4]
+    assert common.select(value, 'a.item[1:].id') == [3]
+    assert common.select(value, '*.item[0]') == [{'id': 1, 'b': {'id': 2}}]
+    assert common.get_selector('a.*') is common.get_selector('a.*')
+
+
+def test_literal_prefix():
+    events = [('start_map', None), ('map_key', 'a[0]'), ('number', 1), ('map_key', '*'), ('number', 2),
+              ('end_map', None)]
+    prefixed = prefix_all(common.parse(None), events)
+    assert common.items_events(prefixed, common.LiteralPrefix('a[0]')) == [1]
+    assert common.items_events(prefixed, common.LiteralPrefix('*')) == [2]
+    assert common.items_events(prefixed, '*') == [1, 2]
+    try:
+        common.items_events(prefixed, 'a[0]')
+    except ValueError as e:
+        assert 'LiteralPrefix' in str(e)
+    else:
+        assert False, 'expected ValueError'
+
+
+def test_select_events():
+    assert common.select_events(MAP_EVENTS, 'docs.*.meta') == [[[1], {}], {'key': 'value'}, None]
+    assert common.select_events(MAP_EVENTS, 'docs.item[1].**', list_factory=tuple) == [{'meta': ((1,), {})}]
+
+
+def test_items_multi_rejects_patterns():
+    try:
+        common.items_multi(None, {'docs.*': 'docs'})
+    except ValueError:
+        pass
+    else:
+        assert False, 'expected ValueError'
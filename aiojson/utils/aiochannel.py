@@ -1,3 +1,4 @@
+import collections
 from asyncio import Queue
 
 
@@ -5,16 +6,43 @@ class ChannelClosed(Exception):
     pass
 
 
+class Batch(list):
+    """
+    Several items put in a Channel as one, see Channel.put_batch.
+    """
+    pass
+
+
 class Channel(Queue):
+    """
+    Queue closed by the producer when it is done.  With a maxsize, put waits
+    while the channel is full, so a producer can't get more than maxsize
+    puts ahead of its consumer.  put_batch takes a list of items as one put,
+    which get then returns one by one.
+    """
     DONE_SYMBOL = object()
 
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        # rest of the batch get is returning items from
+        self.batch = collections.deque()
+
     async def close(self):
         return await self.put(self.DONE_SYMBOL)
 
+    async def put_batch(self, items):
+        if items:
+            return await self.put(Batch(items))
+
     async def get(self):
+        if self.batch:
+            return self.batch.popleft()
         result = await super().get()
-        if result == self.DONE_SYMBOL:
+        if result is self.DONE_SYMBOL:
             raise ChannelClosed()
+        elif isinstance(result, Batch):
+            self.batch.extend(result)
+            return self.batch.popleft()
         elif isinstance(result, Exception):
             # pass errors down the pipeline...
             raise result
@@ -2,29 +2,44 @@ import asyncio
 
 from .aiochannel import Channel, ChannelClosed
 
+# how many sends a generator may get ahead of its consumer, by default
+DEFAULT_MAXSIZE = 64
+
 
 class aiogen:
     """
     To simulate the use of yield in async functions, to make an easy generator
     Wraps a method and makes it iterable via (async for ...)
+
+    The function runs as a task of its own, and its sends wait while maxsize
+    are already waiting for the consumer (0 for no limit).  Use as
+    @aiogen, or @aiogen(maxsize=...) to change the limit.
     """
 
-    def __init__(self, func):
+    def __init__(self, func=None, maxsize=DEFAULT_MAXSIZE):
         self.func = func
+        self.maxsize = maxsize
 
     def __call__(self, *args, **kwargs):
-        iterator = agenerator(self.func, *args, **kwargs)
+        if self.func is None:
+            # used as @aiogen(maxsize=...), we are given the function now
+            self.func = args[0]
+            return self
+        iterator = agenerator(self.func, *args, maxsize=self.maxsize, **kwargs)
         return iterator
 
 
-class agenerator:
-    def __init__(self, func, *args, **kwargs):
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-        self.output = None
+class Sender:
+    """
+    The send function passed to the generator function.  Await send(value)
+    to produce a value, or send.batch(values) to produce several at the cost
+    of a single put.
+    """
+
+    def __init__(self, output):
+        self.output = output
 
-    async def _send(self, *args):
+    async def __call__(self, *args):
         if len(args) == 0:
             raise Exception('Must send some data!')
         elif len(args) == 1:
@@ -35,21 +50,34 @@ class agenerator:
             data = args
         return await self.output.put(data)
 
-    async def run_func(self):
-        try:
-            # result = await self.func(self._send, *self.args, **self.kwargs)
-            result = await self.func(self._send, *self.args, **self.kwargs)
-            await self.output.close()
-        except Exception as e:
-            print('passing exception')
-            await self.output.put(e)
-
-    async def __aiter__(self):
+    async def batch(self, values):
+        return await self.output.put_batch(list(values))
+
+
+async def run_func(func, output, args, kwargs):
+    # a function rather than a method, so the task doesn't keep the
+    # agenerator alive and __del__ can cancel it once it's dropped
+    try:
+        await func(Sender(output), *args, **kwargs)
+        await output.close()
+    except Exception as e:
+        await output.put(e)
+
+
+class agenerator:
+    def __init__(self, func, *args, maxsize=DEFAULT_MAXSIZE, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.maxsize = maxsize
+        self.output = None
+        self.task = None
+
+    def __aiter__(self):
         # make it idempotent
-        if self.output is not None:
-            return
-        self.output = Channel()
-        self.task = asyncio.ensure_future(self.run_func())
+        if self.output is None:
+            self.output = Channel(self.maxsize)
+            self.task = asyncio.ensure_future(run_func(self.func, self.output, self.args, self.kwargs))
         return self
 
     async def __anext__(self):
@@ -60,6 +88,29 @@ class agenerator:
 
     async def next(self):
         if self.output is None:
-            await self.__aiter__()
+            self.__aiter__()
         return await self.__anext__()
 
+    async def aclose(self):
+        """
+        Stops the generator function, for consumers which stop iterating
+        before the end.
+        """
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def __del__(self):
+        # an abandoned generator would otherwise keep its task waiting, or
+        # running to the end if unbounded
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
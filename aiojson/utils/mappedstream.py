@@ -0,0 +1,72 @@
+import asyncio
+import mmap
+
+
+class MappedStreamReader:
+    """
+    Stand-in for an asyncio StreamReader over data held whole in memory, most
+    usefully a memory mapped file, so the OS page cache does the buffering.
+    The python backend recognizes it and tokenizes the data in place; for
+    other consumers read returns memoryview slices of it, without copies,
+    and lets other tasks run first.
+
+    Closing it closes the file mapped by from_file.  While slices of the data
+    are still held elsewhere, such as by a parser stopped before the end, the
+    mapping can't be closed yet and is unmapped once the last one is freed.
+    """
+
+    def __init__(self, data, owned=()):
+        self.data = memoryview(data)
+        self.pos = 0
+        # the mmap and file objects to close along with the view
+        self.owned = owned
+
+    async def read(self, n=-1):
+        await asyncio.sleep(0)
+        if n < 0:
+            n = len(self.data) - self.pos
+        data = self.data[self.pos:self.pos + n]
+        self.pos += len(data)
+        return data
+
+    def at_eof(self):
+        return self.pos >= len(self.data)
+
+    def close(self):
+        self.data.release()
+        for resource in self.owned:
+            try:
+                resource.close()
+            except BufferError:
+                # an mmap with slices still exported, dropping our reference
+                # leaves it to be unmapped with them
+                pass
+        self.owned = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def from_mmap(mm):
+    """
+    Returns a MappedStreamReader over an mmap (or any bytes-like object)
+    opened by the caller, who stays in charge of closing it.
+    """
+    return MappedStreamReader(mm)
+
+
+def from_file(path):
+    """
+    Maps the file at path read-only and returns a MappedStreamReader over it,
+    which closes the mapping and the file when closed.
+    """
+    f = open(path, 'rb')
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # empty files can't be mapped
+        return MappedStreamReader(b'', (f,))
+    return MappedStreamReader(mm, (mm, f))
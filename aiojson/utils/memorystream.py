@@ -0,0 +1,24 @@
+class MemoryStreamReader:
+    """
+    Stand-in for an asyncio StreamReader serving data already held in memory.
+    Handy for tests and benchmarks, where we want to exercise the parsers
+    without a socket.  If chunk_size is given, no read returns more than that,
+    to simulate data arriving in small network packets.
+    """
+
+    def __init__(self, data, chunk_size=None):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.pos = 0
+
+    async def read(self, n=-1):
+        if self.chunk_size is not None and (n < 0 or n > self.chunk_size):
+            n = self.chunk_size
+        if n < 0:
+            n = len(self.data) - self.pos
+        data = self.data[self.pos:self.pos + n]
+        self.pos += len(data)
+        return data
+
+    def at_eof(self):
+        return self.pos >= len(self.data)
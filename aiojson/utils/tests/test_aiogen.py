@@ -11,7 +11,7 @@ async def fact(send, n):
         total *= i
         await send(total)
         print('sent', total)
-        asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
 
 
 async def fact_consume(n):
@@ -27,3 +27,104 @@ def test_fact():
     loop = asyncio.get_event_loop()
     result = loop.run_until_complete(fact_consume(4))
     assert result == 1 + 2 + 6 + 24
+
+
+@aiogen(maxsize=2)
+async def count(send, n, progress):
+    for i in range(n):
+        await send(i)
+        progress.append(i)
+
+
+@aiogen(maxsize=1)
+async def count_batches(send, n, size):
+    for i in range(0, n, size):
+        await send.batch(range(i, min(i + size, n)))
+
+
+async def drain(iterator):
+    values = []
+    while True:
+        try:
+            values.append(await iterator.next())
+        except StopAsyncIteration:
+            return values
+
+
+def test_bounded_backpressure():
+    async def consume():
+        progress = []
+        iterator = count(100, progress)
+        assert await iterator.next() == 0
+        for i in range(5):
+            await asyncio.sleep(0)
+        # the producer is stopped by the full channel, not racing ahead
+        assert len(progress) <= 3
+        return await drain(iterator)
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(consume()) == list(range(1, 100))
+
+
+def test_batches():
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(drain(count_batches(10, 4))) == list(range(10))
+
+
+def test_aclose_cancels_producer():
+    async def consume():
+        progress = []
+        iterator = count(100, progress)
+        await iterator.next()
+        await iterator.aclose()
+        sent = len(progress)
+        for i in range(5):
+            await asyncio.sleep(0)
+        return iterator.task.cancelled(), sent, len(progress)
+    loop = asyncio.get_event_loop()
+    cancelled, sent, later = loop.run_until_complete(consume())
+    assert cancelled
+    assert sent == later < 100
+
+
+def test_unbounded():
+    @aiogen(maxsize=0)
+    async def run_ahead(send, n, progress):
+        for i in range(n):
+            await send(i)
+            progress.append(i)
+
+    async def consume():
+        progress = []
+        iterator = run_ahead(50, progress)
+        await iterator.next()
+        await asyncio.sleep(0)
+        return len(progress)
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(consume()) == 50
+
+
+def test_dropped_generator_cancels_producer():
+    import gc
+
+    @aiogen(maxsize=0)
+    async def run_ahead(send, progress):
+        while True:
+            await send(len(progress))
+            progress.append(None)
+            await asyncio.sleep(0)
+
+    async def consume():
+        progress = []
+        iterator = count(100, progress)
+        await iterator.next()
+        task = iterator.task
+        unbounded = run_ahead([])
+        await unbounded.next()
+        unbounded_task = unbounded.task
+        del iterator, unbounded
+        gc.collect()
+        for i in range(5):
+            await asyncio.sleep(0)
+        return task.cancelled(), unbounded_task.cancelled()
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(consume()) == (True, True)
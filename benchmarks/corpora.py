@@ -0,0 +1,81 @@
+"""
+Generated JSON documents of the shapes the benchmarks run on, each about
+size bytes of utf-8, with the prefix of the objects items should pull out.
+"""
+import json
+import random
+
+# name: (description, prefix for items)
+CORPORA = {
+    'wide': ('flat array of small records', 'item'),
+    'deep': ('records nested a few dozen levels down', 'item.child.child.child'),
+    'strings': ('array of long string values', 'item'),
+    'numbers': ('arrays of integers, decimals and exponents', 'item.item'),
+    'unicode': ('records with escaped and raw non-ASCII text', 'item'),
+    'ndjson': ('newline delimited records', ''),
+}
+
+
+def records(size, make):
+    '''
+    Calls make(i) until the results, as JSON, add up to size bytes.
+    '''
+    values = []
+    total = 0
+    i = 0
+    while total < size:
+        value = make(i)
+        values.append(value)
+        total += len(json.dumps(value)) + 2
+        i += 1
+    return values
+
+
+def wide(size):
+    return json.dumps(records(size, lambda i: {
+        'id': i, 'name': 'user %d' % i, 'active': i % 3 == 0, 'score': i / 7.0, 'manager': None,
+    }))
+
+
+def nested(i, depth):
+    value = {'id': i, 'leaf': True}
+    for level in range(depth):
+        value = {'level': level, 'child': value}
+    return value
+
+
+def deep(size):
+    return json.dumps(records(size, lambda i: nested(i, 40)))
+
+
+def strings(size):
+    rand = random.Random(0)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz ABCDEFGHIJKLMNOPQRSTUVWXYZ 0123456789'
+    return json.dumps(records(size, lambda i: ''.join(rand.choice(alphabet) for c in range(4000))))
+
+
+def numbers(size):
+    rand = random.Random(0)
+    return json.dumps(records(size, lambda i: [
+        rand.randint(-10 ** 9, 10 ** 9), rand.random() * 1000, '%.3e' % rand.random(),
+    ])).replace('"', '')
+
+
+def unicode(size):
+    words = ['gr\xfc\xdfe', 'привет', '日本語', '\U0001f600 ok']
+    escaped = records(size // 2, lambda i: {'text': ' '.join(words[(i + w) % 4] for w in range(8))})
+    raw = records(size // 2, lambda i: {'text': ' '.join(words[(i + w) % 4] for w in range(8))})
+    return json.dumps(escaped)[:-1] + ', ' + json.dumps(raw, ensure_ascii=False)[1:]
+
+
+def ndjson(size):
+    return ''.join(json.dumps(record) + '\n' for record in records(size, lambda i: {
+        'ts': 1500000000 + i, 'level': 'info', 'message': 'request %d served' % i, 'took': 0.25,
+    }))
+
+
+def generate(name, size):
+    '''
+    Returns the utf-8 bytes of the corpus called name.
+    '''
+    return globals()[name](size).encode('utf-8')
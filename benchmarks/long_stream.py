@@ -0,0 +1,74 @@
+"""
+Parses a long generated stream and reports throughput, the largest size the
+lexer buffer reached and the peak RSS.  With the buffer keeping only its
+unconsumed tail, memory stays bounded by the longest token plus one chunk,
+whatever the stream length.
+
+Run from the repository root:
+
+    python -m benchmarks.long_stream [--size-mb 1024] [--chunk-size 16384]
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from aiojson.backends.python import basic_parse_batches
+
+# a record with a string long enough to straddle many chunk boundaries
+RECORD = b'{"id": 12345, "name": "' + b'x' * 5000 + b'", "values": [1.5, 2, 3]},\n'
+
+
+class GeneratedStreamReader:
+    """
+    Streams an array of RECORD repeated until size bytes, without ever
+    holding more than one read in memory.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.sent = 0
+        self.pending = b'['
+
+    async def read(self, n=-1):
+        if n < 0:
+            n = 64 * 1024
+        while len(self.pending) < n and self.sent < self.size:
+            self.pending += RECORD
+            self.sent += len(RECORD)
+            if self.sent >= self.size:
+                self.pending = self.pending[:-2] + b']'
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
+
+
+async def run(size, chunk_size):
+    parser = basic_parse_batches(GeneratedStreamReader(size), buf_size=chunk_size)
+    events = 0
+    max_buffer = 0
+    while True:
+        try:
+            events += len(await parser.next())
+        except StopAsyncIteration:
+            return events, max_buffer
+        max_buffer = max(max_buffer, len(parser.parser.buffer))
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--size-mb', type=int, default=1024)
+    args.add_argument('--chunk-size', type=int, default=16 * 1024)
+    opts = args.parse_args()
+
+    size = opts.size_mb * 1024 * 1024
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    events, max_buffer = loop.run_until_complete(run(size, opts.chunk_size))
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('%d MB, %d events in %.2fs: %.2f MB/s, max buffer %d bytes, peak RSS %d kB' % (
+        opts.size_mb, events, elapsed, opts.size_mb / elapsed, max_buffer, peak_rss))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Throughput of basic_parse on documents with multi-megabyte string values
+(as with base64 payloads) arriving in small chunks.  Each chunk should only
+cost scanning the new data, not the whole string read so far.
+
+Run from the repository root:
+
+    python -m benchmarks.long_strings [--string-mb 8] [--strings 4] [--chunk-size 16384]
+"""
+import argparse
+import asyncio
+import time
+
+from aiojson.backends.python import basic_parse_batches
+from aiojson.utils.memorystream import MemoryStreamReader
+
+
+def long_strings_document(string_size, strings):
+    value = (b'QUJDREVGR0hJSktMTU5PUA==' * (string_size // 24 + 1))[:string_size]
+    return b'[' + b', '.join(b'"' + value + b'"' for i in range(strings)) + b']'
+
+
+async def count_events(stream, chunk_size):
+    parser = basic_parse_batches(stream, buf_size=chunk_size)
+    count = 0
+    while True:
+        try:
+            count += len(await parser.next())
+        except StopAsyncIteration:
+            return count
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--string-mb', type=float, default=8)
+    args.add_argument('--strings', type=int, default=4)
+    args.add_argument('--chunk-size', type=int, default=16 * 1024)
+    args.add_argument('--text', action='store_true', help='feed decoded str chunks instead of bytes')
+    opts = args.parse_args()
+
+    data = long_strings_document(int(opts.string_mb * 1024 * 1024), opts.strings)
+    if opts.text:
+        data = data.decode('utf-8')
+    stream = MemoryStreamReader(data, chunk_size=opts.chunk_size)
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    events = loop.run_until_complete(count_events(stream, opts.chunk_size))
+    elapsed = time.perf_counter() - start
+    mb = len(data) / (1024 * 1024)
+    print('%.1f MB, %d events in %.2fs: %.2f MB/s' % (mb, events, elapsed, mb / elapsed))
+
+
+if __name__ == '__main__':
+    main()
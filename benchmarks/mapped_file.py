@@ -0,0 +1,76 @@
+"""
+Throughput of basic_parse over a local file: read in chunks through a
+stream, against tokenized in place over a memory mapping with from_file.
+
+Run from the repository root:
+
+    python -m benchmarks.mapped_file [--records 200000] [--window 65536]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from aiojson.backends.python import basic_parse_batches
+from aiojson.utils.mappedstream import from_file
+
+
+class FileStreamReader:
+    """
+    Plain stream over a file, copying each chunk read.
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    async def read(self, n=-1):
+        return self.f.read(n)
+
+
+def write_document(f, records):
+    f.write(b'[')
+    for i in range(records):
+        if i:
+            f.write(b', ')
+        f.write(json.dumps({'id': i, 'name': 'record %d' % i, 'values': [i, i / 2, None]}).encode('utf-8'))
+    f.write(b']')
+
+
+async def count_events(batches):
+    count = 0
+    while True:
+        try:
+            count += len(await batches.next())
+        except StopAsyncIteration:
+            return count
+
+
+def timed(name, stream, window, size):
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    events = loop.run_until_complete(count_events(basic_parse_batches(stream, buf_size=window)))
+    elapsed = time.perf_counter() - start
+    mb = size / (1024 * 1024)
+    print('%-8s %.1f MB, %d events in %.2fs: %.2f MB/s' % (name, mb, events, elapsed, mb / elapsed))
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--records', type=int, default=200000)
+    args.add_argument('--window', type=int, default=64 * 1024)
+    opts = args.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix='.json') as f:
+        write_document(f, opts.records)
+        f.flush()
+        size = os.path.getsize(f.name)
+        with open(f.name, 'rb') as stream:
+            timed('read', FileStreamReader(stream), opts.window, size)
+        with from_file(f.name) as stream:
+            timed('mmap', stream, opts.window, size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Events per second of basic_parse on deeply nested documents made of many
+small objects, the shape that used to be dominated by the per-container
+task and queue overhead.
+
+Run from the repository root:
+
+    python -m benchmarks.nested [--depth 20] [--objects 20000]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiojson.backends.python import basic_parse
+from aiojson.utils.memorystream import MemoryStreamReader
+
+
+def nested_document(depth, objects):
+    record = {'id': 1, 'tags': ['a', 'b'], 'pos': {'x': 1.5, 'y': -2}}
+    doc = [record] * objects
+    for i in range(depth):
+        doc = {'level%d' % i: [doc]}
+    return json.dumps(doc).encode('utf-8')
+
+
+async def count_events(data):
+    parser = basic_parse(MemoryStreamReader(data))
+    count = 0
+    while True:
+        try:
+            await parser.next()
+        except StopAsyncIteration:
+            return count
+        count += 1
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--depth', type=int, default=20)
+    args.add_argument('--objects', type=int, default=20000)
+    opts = args.parse_args()
+
+    data = nested_document(opts.depth, opts.objects)
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    events = loop.run_until_complete(count_events(data))
+    elapsed = time.perf_counter() - start
+    print('%d bytes, %d events in %.2fs: %.0f events/s' % (len(data), events, elapsed, events / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Throughput of newline delimited JSON decoding: jsonl on the event loop
+against parallel_jsonl over process pools of growing size.  Scaling should
+be close to linear up to the number of cores.
+
+Run from the repository root:
+
+    python -m benchmarks.parallel_jsonl [--records 200000] [--workers 1 2 4 8]
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiojson.backends.python import jsonl, parallel_jsonl
+from aiojson.utils.memorystream import MemoryStreamReader
+
+
+def jsonl_document(records):
+    return b''.join(json.dumps({
+        'id': i,
+        'level': 'info',
+        'message': 'request %d served' % i,
+        'tags': ['web', 'api'],
+        'took': 0.25,
+    }).encode('utf-8') + b'\n' for i in range(records))
+
+
+async def count_values(values):
+    count = 0
+    while True:
+        try:
+            await values.next()
+            count += 1
+        except StopAsyncIteration:
+            return count
+
+
+def timed(values):
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    count = loop.run_until_complete(count_values(values))
+    return count, time.perf_counter() - start
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--records', type=int, default=200000)
+    args.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args.add_argument('--block-size', type=int, default=1024 * 1024)
+    opts = args.parse_args()
+
+    data = jsonl_document(opts.records)
+    mb = len(data) / (1024 * 1024)
+    count, elapsed = timed(jsonl(MemoryStreamReader(data), buf_size=64 * 1024))
+    print('%-12s %d values in %.2fs: %.1f MB/s' % ('jsonl', count, elapsed, mb / elapsed))
+    for workers in opts.workers:
+        with ProcessPoolExecutor(workers) as executor:
+            # start the workers before timing
+            executor.submit(len, '').result()
+            values = parallel_jsonl(MemoryStreamReader(data), executor, buf_size=64 * 1024,
+                                    block_size=opts.block_size)
+            count, elapsed = timed(values)
+        print('%-12s %d values in %.2fs: %.1f MB/s' % ('%d workers' % workers, count, elapsed, mb / elapsed))
+
+
+if __name__ == '__main__':
+    main()
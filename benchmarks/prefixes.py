@@ -0,0 +1,83 @@
+"""
+Cost per event of the prefix tracking in common.parse, on deep and wide
+documents, next to the previous approach of joining the whole path for
+every event.  The incremental tracking should stay flat as depth grows.
+
+Run from the repository root:
+
+    python -m benchmarks.prefixes [--events 200000]
+"""
+import argparse
+import time
+
+from aiojson import common
+
+
+class join_parse:
+    '''
+    The previous prefix tracking, rebuilding the prefix from the path for
+    every event, for comparison.
+    '''
+    def __init__(self):
+        self.path = []
+
+    def prefixed(self, event, value):
+        if event == 'map_key':
+            prefix = '.'.join(self.path[:-1])
+            self.path[-1] = value
+        elif event == 'start_map':
+            prefix = '.'.join(self.path)
+            self.path.append(None)
+        elif event == 'end_map':
+            self.path.pop()
+            prefix = '.'.join(self.path)
+        elif event == 'start_array':
+            prefix = '.'.join(self.path)
+            self.path.append('item')
+        elif event == 'end_array':
+            self.path.pop()
+            prefix = '.'.join(self.path)
+        else:
+            prefix = '.'.join(self.path)
+        return (prefix, event, value)
+
+
+def document_events(depth, width, count):
+    '''
+    Basic events of maps nested depth levels, around arrays of width records.
+    '''
+    opening = []
+    for i in range(depth):
+        opening += [('start_map', None), ('map_key', 'level%d' % i)]
+    record = [('start_map', None), ('map_key', 'id'), ('number', 1),
+              ('map_key', 'name'), ('string', 'x'), ('end_map', None)]
+    body = [('start_array', None)] + record * width + [('end_array', None)]
+    closing = [('end_map', None)] * depth
+    events = []
+    while len(events) < count:
+        events += opening + body + closing
+    return events
+
+
+def time_per_event(parser, events):
+    prefixed = parser.prefixed
+    start = time.perf_counter()
+    for event, value in events:
+        prefixed(event, value)
+    return (time.perf_counter() - start) / len(events) * 1e9
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--events', type=int, default=200000)
+    opts = args.parse_args()
+
+    print('%6s %6s %12s %12s' % ('depth', 'width', 'join ns/ev', 'incr ns/ev'))
+    for depth, width in ((1, 1000), (10, 1000), (50, 1000), (200, 1000), (10, 10), (10, 100000)):
+        events = document_events(depth, width, opts.events)
+        print('%6d %6d %12.0f %12.0f' % (
+            depth, width, time_per_event(join_parse(), events), time_per_event(common.parse(None), events)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Fixed against adaptive read sizes over simulated links: an asyncio
+StreamReader fed at a given rate by another task, like a transport would.
+When data piles up faster than it is parsed, adaptive reads take it in
+fewer, larger chunks; on slow links they stay small.
+
+Run from the repository root:
+
+    python -m benchmarks.read_size [--mb 2] [--packet 1460]
+"""
+import argparse
+import asyncio
+import time
+
+from aiojson import common
+from aiojson.backends.python import basic_parse_batches
+
+# a small record, so parsing costs about as much as in typical API payloads
+RECORD = b'{"id": 12345, "name": "some name", "tags": ["a", "b"], "score": 1.5}'
+
+# the most a transport hands over from one recv
+RECV_SIZE = 256 * 1024
+
+# name and bytes per second, None for as fast as the loop goes
+LINKS = [
+    ('unlimited', None),
+    ('1 GB/s', 1024 ** 3),
+    ('100 MB/s', 100 * 1024 ** 2),
+    ('10 MB/s', 10 * 1024 ** 2),
+    ('1 MB/s', 1024 ** 2),
+    ('100 KB/s', 100 * 1024),
+]
+
+
+def link_document(size):
+    count = size // (len(RECORD) + 2)
+    return b'[' + b', '.join([RECORD] * count) + b']'
+
+
+async def produce(stream, data, packet, rate):
+    '''
+    Feeds the data that arrived since the last turn, like a transport does
+    with each recv of up to RECV_SIZE bytes, at least a packet at a time.
+    '''
+    start = time.perf_counter()
+    sent = 0
+    while sent < len(data):
+        if rate is None:
+            due = len(data)
+        else:
+            due = int((time.perf_counter() - start) * rate)
+        size = min(max(due - sent, packet), RECV_SIZE)
+        stream.feed_data(data[sent:sent + size])
+        sent += size
+        if rate is None:
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(max(start + (sent + packet) / rate - time.perf_counter(), 0))
+    stream.feed_eof()
+
+
+async def consume(stream, buf_size):
+    batches = basic_parse_batches(stream, buf_size=buf_size)
+    count = 0
+    while True:
+        try:
+            count += len(await batches.next())
+        except StopAsyncIteration:
+            return count
+
+
+async def run(data, packet, rate, buf_size):
+    stream = asyncio.StreamReader(limit=2 ** 30)
+    reads = []
+    original_read = stream.read
+
+    async def counted_read(n=-1):
+        chunk = await original_read(n)
+        reads.append(len(chunk))
+        return chunk
+    stream.read = counted_read
+    producer = asyncio.ensure_future(produce(stream, data, packet, rate))
+    start, cpu = time.perf_counter(), time.process_time()
+    events = await consume(stream, buf_size)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    await producer
+    return events, elapsed, cpu, len(reads)
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--mb', type=float, default=2)
+    args.add_argument('--packet', type=int, default=1460)
+    opts = args.parse_args()
+
+    data = link_document(int(opts.mb * 1024 * 1024))
+    loop = asyncio.get_event_loop()
+    for name, rate in LINKS:
+        for label, buf_size in [('fixed 16K', 16 * 1024), ('adaptive', common.AdaptiveReadSize())]:
+            events, elapsed, cpu, reads = loop.run_until_complete(run(data, opts.packet, rate, buf_size))
+            print('%-10s %-10s %d events, %6d reads, %.2fs wall, %.2fs cpu' % (
+                name, label, events, reads, elapsed, cpu))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark suite: times the lexer and the parsing functions of the python
+backend over generated corpora (see benchmarks.corpora) read from an
+in-memory stream in chunks of several sizes, reporting MB/s, events (or
+tokens) per second and peak RSS.  Results can be saved as a baseline and
+later runs compared against it.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--size-kb 256] [--chunk-sizes 1024 16384 262144]
+                               [--corpus wide deep] [--target basic_parse items]
+                               [--save benchmarks/baselines/NAME.json]
+                               [--compare benchmarks/baselines/NAME.json]
+
+Peak RSS is the process peak once each case has run, so it only grows;
+run a single case to see its own peak.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import time
+
+from aiojson import common
+from aiojson.backends.python import BytesBuffer, Lexer, basic_parse, get_tokens, items, parse
+from aiojson.utils.memorystream import MemoryStreamReader
+
+from .corpora import CORPORA, generate
+
+
+def run_get_tokens(data, chunk_size, prefix):
+    # combine chunks into the buffer like Lexer does, without the awaits
+    buffer = BytesBuffer(data[:chunk_size])
+    count = 0
+    for pos in range(chunk_size, len(data) + chunk_size, chunk_size):
+        for token in get_tokens(buffer, more_data=pos < len(data)):
+            count += 1
+        if pos < len(data):
+            buffer = buffer + BytesBuffer(data[pos:pos + chunk_size])
+    return count
+
+
+async def drain(iterator):
+    count = 0
+    while True:
+        try:
+            await iterator.next()
+        except StopAsyncIteration:
+            return count
+        count += 1
+
+
+def stream(data, chunk_size):
+    return MemoryStreamReader(data, chunk_size)
+
+
+async def run_lexer(data, chunk_size, prefix):
+    return await drain(Lexer(stream(data, chunk_size), chunk_size))
+
+
+async def run_basic_parse(data, chunk_size, prefix):
+    return await drain(basic_parse(stream(data, chunk_size), chunk_size))
+
+
+async def run_parse(data, chunk_size, prefix):
+    return await drain(parse(stream(data, chunk_size), chunk_size))
+
+
+async def run_common_parse(data, chunk_size, prefix):
+    # common.parse over every event, without the prefix skipping of the
+    # python backend
+    return await drain(common.parse(basic_parse(stream(data, chunk_size), chunk_size)))
+
+
+async def run_items(data, chunk_size, prefix):
+    return await drain(items(stream(data, chunk_size), prefix))
+
+
+async def run_common_items(data, chunk_size, prefix):
+    events = common.parse(basic_parse(stream(data, chunk_size), chunk_size))
+    return await drain(common.items(events, prefix))
+
+
+TARGETS = {
+    'get_tokens': run_get_tokens,
+    'Lexer': run_lexer,
+    'basic_parse': run_basic_parse,
+    'parse': run_parse,
+    'common.parse': run_common_parse,
+    'items': run_items,
+    'common.items': run_common_items,
+}
+
+
+def run_case(target, data, chunk_size, prefix):
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    result = TARGETS[target](data, chunk_size, prefix)
+    if asyncio.iscoroutine(result):
+        result = loop.run_until_complete(result)
+    elapsed = time.perf_counter() - start
+    mb = len(data) / (1024 * 1024)
+    return {
+        'mb_s': mb / elapsed,
+        'events_s': result / elapsed,
+        'count': result,
+        'seconds': elapsed,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--size-kb', type=int, default=256)
+    args.add_argument('--chunk-sizes', type=int, nargs='+', default=[1024, 16 * 1024, 256 * 1024])
+    args.add_argument('--corpus', nargs='+', choices=sorted(CORPORA), default=list(CORPORA))
+    args.add_argument('--target', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    args.add_argument('--save', metavar='PATH', help='write the results to a baseline file')
+    args.add_argument('--compare', metavar='PATH', help='compare MB/s with a baseline file')
+    opts = args.parse_args()
+
+    baseline = {}
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)['results']
+    results = {}
+    for corpus in opts.corpus:
+        data = generate(corpus, opts.size_kb * 1024)
+        prefix = CORPORA[corpus][1]
+        for target in opts.target:
+            for chunk_size in opts.chunk_sizes:
+                case = '%s/%s/%d' % (corpus, target, chunk_size)
+                result = results[case] = run_case(target, data, chunk_size, prefix)
+                line = '%-36s %8.2f MB/s %10.0f /s %8d kB' % (
+                    case, result['mb_s'], result['events_s'], result['peak_rss_kb'])
+                if case in baseline:
+                    line += '  %+6.1f%%' % (100 * (result['mb_s'] / baseline[case]['mb_s'] - 1))
+                print(line)
+    if opts.save:
+        with open(opts.save, 'w') as f:
+            json.dump({'size_kb': opts.size_kb, 'results': results}, f, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
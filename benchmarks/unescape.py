@@ -0,0 +1,94 @@
+"""
+Speed of string decoding: unescape_string (the json module's C scanner) and
+the regex based unescape against the previous character loop, on strings with few and with many escapes, and of map keys
+decoded through the key cache.
+
+Run from the repository root:
+
+    python -m benchmarks.unescape [--length 4096] [--repeat 200]
+"""
+import argparse
+import json
+import time
+
+from aiojson.backends.python import unescape, unescape_key, unescape_string
+
+
+def loop_unescape(s):
+    '''
+    The previous implementation, appending one escape at a time.
+    '''
+    start = 0
+    result = ''
+    while start < len(s):
+        pos = s.find('\\', start)
+        if pos == -1:
+            if start == 0:
+                return s
+            result += s[start:]
+            break
+        result += s[start:pos]
+        pos += 1
+        esc = s[pos]
+        if esc == 'u':
+            result += chr(int(s[pos + 1:pos + 5], 16))
+            pos += 4
+        elif esc == 'b':
+            result += '\b'
+        elif esc == 'f':
+            result += '\f'
+        elif esc == 'n':
+            result += '\n'
+        elif esc == 'r':
+            result += '\r'
+        elif esc == 't':
+            result += '\t'
+        else:
+            result += esc
+        start = pos + 1
+    return result
+
+
+def encoded(text):
+    return json.dumps(text)[1:-1]
+
+
+def timed(func, value, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(value)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    args.add_argument('--length', type=int, default=4096)
+    args.add_argument('--repeat', type=int, default=200)
+    opts = args.parse_args()
+
+    cases = [
+        ('few escapes', encoded(('lorem ipsum dolor sit amet ' * opts.length)[:opts.length - 1] + '\n')),
+        ('many escapes', encoded(('line\t"quoted"\n' * opts.length)[:opts.length])),
+        ('non-ascii', encoded(('caf\xe9 中 ' * opts.length)[:opts.length])),
+    ]
+    for name, value in cases:
+        old = timed(loop_unescape, value, opts.repeat)
+        regex = timed(unescape, value, opts.repeat)
+        new = timed(unescape_string, '"' + value + '"', opts.repeat)
+        print('%-12s loop %8.1f us  regex %8.1f us  scanner %8.1f us  %5.1fx' % (
+            name, old * 1e6, regex * 1e6, new * 1e6, old / new))
+
+    keys = ['"field_%d"' % (i % 20) for i in range(100000)]
+    start = time.perf_counter()
+    for key in keys:
+        loop_unescape(key[1:-1])
+    old = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        unescape_key(key)
+    new = time.perf_counter() - start
+    print('%-12s loop %8.1f ms  cached %7.1f ms  %5.1fx' % ('map keys', old * 1e3, new * 1e3, old / new))
+
+
+if __name__ == '__main__':
+    main()